@@ -0,0 +1,77 @@
+"""
+Benchmark do arranque a frio do emprego.py.
+
+Mede, em processos novos, o tempo de `import emprego` (via -X importtime)
+e o tempo total de comandos que não precisam de rede, e compara com o
+custo de importar logo todas as dependências pesadas (como o script
+fazia antes das importações tardias).
+
+Uso:
+  python benchmarks/bench_arranque.py [--repeticoes N]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+SCRIPT = os.path.join(RAIZ, "emprego.py")
+RE_IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)")
+
+
+def tempo_import(codigo, modulo):
+    """
+    Tempo cumulativo (ms) da importação de `modulo` num processo novo.
+    """
+    saida = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                           cwd=RAIZ, capture_output=True, text=True, check=True).stderr
+    for linha in saida.splitlines():
+        match = RE_IMPORTTIME.match(linha)
+        if match and match.group(2) == modulo:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"{modulo} não aparece no -X importtime")
+
+
+def tempo_comando(args):
+    """
+    Tempo total (ms) de `python emprego.py ARGS` num processo novo.
+    """
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, SCRIPT] + args, cwd=RAIZ, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeticoes", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+        for i in range(20):
+            f.write(json.dumps({"id": i, "title": "Dev", "body": "<p>remoto</p>"}) + "\n")
+        dump = f.name
+
+    medicoes = [
+        ("import emprego", lambda: tempo_import("import emprego", "emprego")),
+        ("import requests+bs4+lxml+asyncio",
+         lambda: sum(tempo_import(f"import {m}", m) for m in ("requests", "bs4", "lxml.html", "asyncio"))),
+        ("emprego.py --help", lambda: tempo_comando(["--help"])),
+        ("emprego.py type --jobs-file", lambda: tempo_comando(["type", "--jobs-file", dump])),
+    ]
+    try:
+        print(f"{'':<36}{'mediana ms':>12}{'mín ms':>10}")
+        for nome, medir in medicoes:
+            tempos = [medir() for _ in range(args.repeticoes)]
+            print(f"{nome:<36}{statistics.median(tempos):>12.1f}{min(tempos):>10.1f}")
+    finally:
+        os.unlink(dump)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark da conversão HTML -> texto das descrições dos anúncios.
+
+Compara a expressão regular original (só remove tags) com o conversor
+atual (emprego.clean_html) sobre descrições guardadas em JSON Lines (p.ex.
+o resultado de `python emprego.py top 1000 jobs.jsonl`) e mostra onde os
+dois diferem.
+
+O conversor atual faz mais trabalho do que a regex (ignora script/style e
+comentários, quebra linhas nos blocos, descodifica entidades e colapsa
+espaços) e, em HTML bem formado, é várias vezes mais lento do que ela: a
+regex é um único re.sub, o conversor são três, mais html.unescape e a
+normalização das linhas. Em contrapartida, o tempo do conversor é sempre
+linear no tamanho do HTML, também em HTML malformado (tags ou aspas por
+fechar), que é a segunda parte do benchmark.
+
+Uso:
+  python benchmarks/bench_clean_html.py [jobs.jsonl] [--repeticoes N]
+
+Sem ficheiro, usa descrições sintéticas com tamanhos crescentes.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import emprego  # noqa: E402
+
+RE_TAGS = re.compile('<.*?>')
+
+
+def clean_html_regex(raw_html):
+    # versão original do clean_html
+    return re.sub(RE_TAGS, '', raw_html).strip()
+
+
+def descricao_sintetica(blocos):
+    partes = ["<style>p { color: red }</style>"]
+    for i in range(blocos):
+        partes.append(f"<h3>Requisitos {i}</h3><ul><li>Python&amp;Django</li>"
+                      f"<li>SQL&nbsp;e&nbsp;Docker</li></ul><p>Regime h&iacute;brido em Lisboa.</p>")
+    partes.append("<script>var x = '<p>n&atilde;o</p>';</script>")
+    return "".join(partes)
+
+
+def medir(func, textos, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for texto in textos:
+            func(texto)
+    return time.perf_counter() - inicio
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("jobs", nargs="?", help="ficheiro JSON Lines com anúncios (campo body)")
+    ap.add_argument("--repeticoes", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.jobs:
+        textos = [job.get("body") or "" for job in emprego.ler_jobs(args.jobs)]
+        if not textos:
+            print(f"Nenhum anúncio em {args.jobs}")
+            sys.exit(1)
+        conjuntos = [(f"{len(textos)} descrições", textos)]
+    else:
+        conjuntos = [(f"{blocos} blocos", [descricao_sintetica(blocos)] * 20) for blocos in (10, 100, 1000)]
+
+    for nome, textos in conjuntos:
+        tamanho = sum(len(t) for t in textos)
+        t_regex = medir(clean_html_regex, textos, args.repeticoes)
+        t_novo = medir(emprego.clean_html, textos, args.repeticoes)
+        mb = tamanho * args.repeticoes / 1e6
+        print(f"{nome:>18}: regex {t_regex:.3f}s ({mb / t_regex:.1f} MB/s)  "
+              f"clean_html {t_novo:.3f}s ({mb / t_novo:.1f} MB/s)  "
+              f"({t_novo / t_regex:.1f}x o tempo da regex)")
+
+    # HTML malformado: o tempo deve duplicar (e não quadruplicar) quando o
+    # tamanho duplica
+    print("\nHTML malformado (clean_html):")
+    for padrao in ("<a ", '<a x="', "<!--", "<script>"):
+        tempos = []
+        for n in (4000, 8000, 16000):
+            tempos.append(medir(emprego.clean_html, [padrao * n], 1))
+        print(f"{json.dumps(padrao):>18}: " + "  ".join(
+            f"{n * len(padrao) // 1000} KB {t * 1000:.1f} ms" for n, t in zip((4000, 8000, 16000), tempos)))
+
+    # Diferenças no conteúdo (o que a regex deixava passar)
+    exemplo = conjuntos[0][1][0]
+    print("\nregex:     ", json.dumps(clean_html_regex(exemplo)[:160], ensure_ascii=False))
+    print("clean_html:", json.dumps(emprego.clean_html(exemplo)[:160], ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
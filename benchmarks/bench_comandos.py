@@ -0,0 +1,307 @@
+"""
+Benchmark de todos os comandos contra um servidor local que imita a API
+do itjobs.pt e o Teamlyzer, com catálogos de 1k/10k/100k anúncios.
+
+Para cada comando e tamanho mostra o tempo total, o débito (itens/s), a
+latência dos pedidos (p50/p95, das métricas do --profile) e o pico de
+memória (tracemalloc, numa segunda passagem para não pesar no tempo).
+O servidor corre noutro processo, por isso nem o seu tempo de CPU nem a
+sua memória entram nas medições.
+
+Uso:
+  python benchmarks/bench_comandos.py [--tamanhos 1000,10000] [--comandos top,get]
+                                      [--max-pedidos N] [--fixtures PASTA] [--json]
+
+Com --fixtures, os anúncios e a página de empresa usados como modelo vêm
+de respostas reais gravadas com EMPREGO_RECORD:
+  EMPREGO_RECORD=fixtures python emprego.py top 200 --no-cache
+  EMPREGO_RECORD=fixtures python emprego.py get 506697 --no-cache
+As mesmas gravações servem para correr os comandos sem rede:
+  EMPREGO_REPLAY=fixtures python emprego.py top 200 --no-cache
+"""
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+
+COMANDOS = ["top", "search", "type", "skills", "get", "statistics zone", "list skills"]
+LOCALIDADES = ["Lisboa", "Porto", "Braga", "Coimbra", "Aveiro", "Faro"]
+TIPOS = ["Full-time", "Part-time", "Estágio"]
+CORPO_MODELO = (
+    "<p>Procuramos um(a) developer para a nossa equipa em regime <strong>{regime}</strong>.</p>"
+    "<h3>Requisitos</h3><ul><li>Python &amp; Django</li><li>SQL, Docker e AWS</li>"
+    "<li>JavaScript / React</li></ul><p>Oferecemos seguro de sa&uacute;de e forma&ccedil;&atilde;o.</p>"
+)
+PAGINA_EMPRESA = (
+    '<html><head><meta name="description" content="Empresa de software"></head><body>'
+    "<p>Rating 4,2</p><ul><li>Seguro de saúde</li><li>Ginásio</li><li>Formação</li><li>Bónus</li></ul>"
+    "<span>Salário médio: 1800€</span></body></html>"
+)
+
+
+# Dados sintéticos
+
+def carregar_modelos(pasta):
+    """
+    Anúncios e página de empresa gravados em `pasta` (EMPREGO_RECORD), se existirem.
+    """
+    jobs, pagina = [], None
+    for ficheiro in glob.glob(os.path.join(pasta, "**", "*.json"), recursive=True):
+        with open(ficheiro, encoding="utf-8") as f:
+            gravacao = json.load(f)
+        if gravacao.get("codificacao") != "utf-8" or gravacao.get("status") != 200:
+            continue
+        caminho = urlsplit(gravacao["pedido"]).path
+        if caminho.endswith(("/job/list.json", "/job/search.json")):
+            jobs.extend(json.loads(gravacao["corpo"]).get("results") or [])
+        elif caminho.endswith("/job/get.json"):
+            jobs.append(json.loads(gravacao["corpo"]))
+        elif "/companies/" in caminho and not caminho.endswith(("/ranking", "/jobs")):
+            pagina = gravacao["corpo"]
+    return [job for job in jobs if "error" not in job], pagina
+
+
+def gerar_jobs(n, modelos=()):
+    """
+    Catálogo determinístico de `n` anúncios, do mais recente para o mais
+    antigo. Com modelos (anúncios reais) reaproveita títulos e descrições.
+    """
+    n_empresas = max(3, min(5000, n // 20))
+    jobs = []
+    for i in range(n):
+        dia = i // 50
+        data = f"{2024 - dia // 336}-{12 - dia // 28 % 12:02d}-{28 - dia % 28:02d} 10:00:00"
+        modelo = modelos[i % len(modelos)] if modelos else None
+        jobs.append({
+            "id": 100000 + i,
+            "title": modelo["title"] if modelo else f"Developer {['Python', 'Java', 'Frontend', 'Data'][i % 4]}",
+            "body": (modelo.get("body") or "") if modelo else CORPO_MODELO.format(
+                regime=["remoto", "híbrido", "presencial"][i % 3]),
+            "company": {"name": f"Empresa {i % n_empresas}"},
+            "locations": [{"name": LOCALIDADES[i % len(LOCALIDADES)]}],
+            "types": [{"name": TIPOS[i % len(TIPOS)]}],
+            "wage": None,
+            "publishedAt": data,
+            "updatedAt": data,
+        })
+    return jobs, n_empresas
+
+
+# Servidor local (corre num processo à parte)
+
+def servir(porta_pronta, n, modelos, pagina_empresa):
+    jobs, n_empresas = gerar_jobs(n, modelos)
+    por_id = {str(job["id"]): job for job in jobs}
+    # Resultados de cada pesquisa, calculados uma vez (as páginas seguintes reaproveitam)
+    pesquisas = {}
+
+    def pesquisar(texto, inicio, fim):
+        chave = (texto, inicio, fim)
+        if chave not in pesquisas:
+            pesquisas[chave] = [
+                job for job in jobs
+                if texto in job["company"]["name"].lower() and inicio <= job["publishedAt"][:10] <= fim
+            ]
+        return pesquisas[chave]
+
+    ranking = "<html><body>" + "".join(
+        f'<a href="/companies/empresa-{i}">Empresa {i}</a>' for i in range(n_empresas)
+    ) + '<a href="/companies/ranking">Ranking</a></body></html>'
+    pagina_skills = "<html><body>" + "".join(
+        f"<div><h4>Vaga {i}</h4><p>python, django, sql, docker, aws, react</p></div>" for i in range(200)
+    ) + "</body></html>"
+    pagina_empresa = pagina_empresa or PAGINA_EMPRESA
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers e corpo vão em escritas separadas: sem isto o keep-alive
+        # leva ~40ms de atraso por pedido (Nagle + ACK atrasado)
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def responder(self, corpo, tipo):
+            dados = corpo.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", f"{tipo}; charset=utf-8")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            partes = urlsplit(self.path)
+            q = {k: v[0] for k, v in parse_qs(partes.query).items()}
+            caminho = partes.path
+            if caminho == "/job/get.json":
+                job = por_id.get(q.get("id"), {"error": {"code": 404, "message": "Job not found"}})
+                return self.responder(json.dumps(job), "application/json")
+            if caminho in ("/job/list.json", "/job/search.json"):
+                selecao = jobs
+                if {"q", "published_after", "published_before"} & q.keys():
+                    selecao = pesquisar(q.get("q", "").lower(), q.get("published_after", ""),
+                                        q.get("published_before", "9999"))
+                limite, pagina = int(q.get("limit", 12)), int(q.get("page", 1))
+                corpo = {"total": len(selecao), "results": selecao[(pagina - 1) * limite:pagina * limite]}
+                return self.responder(json.dumps(corpo), "application/json")
+            if caminho == "/companies/ranking":
+                return self.responder(ranking, "text/html")
+            if caminho == "/companies/jobs":
+                return self.responder(pagina_skills, "text/html")
+            if caminho.startswith("/companies/"):
+                return self.responder(pagina_empresa, "text/html")
+            self.send_error(404)
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    servidor.daemon_threads = True
+    porta_pronta.put(servidor.server_port)
+    servidor.serve_forever()
+
+
+def arrancar_servidor(n, modelos, pagina_empresa):
+    fila = multiprocessing.Queue()
+    processo = multiprocessing.Process(target=servir, args=(fila, n, modelos, pagina_empresa), daemon=True)
+    processo.start()
+    return processo, fila.get(timeout=60)
+
+
+# Execução dos comandos
+
+def preparar(emprego, base):
+    """
+    Aponta o emprego para o servidor local e limpa o estado entre execuções.
+    """
+    emprego.URL = emprego.TEAMLYZER_BASE = base
+    emprego.CACHE_ATIVA = False
+    emprego.PERFIL_ATIVO = True
+    emprego.METRICAS = emprego.Metricas()
+    emprego._indice_empresas = None
+    # Anúncios vistos noutro comando poupariam pedidos a este
+    with emprego._lock_vistos:
+        emprego._jobs_vistos.clear()
+    # O índice de empresas guardado em disco é de outro catálogo (outro tamanho)
+    with emprego._lock_cache:
+        db = emprego._cache_db()
+        db.execute("DELETE FROM teamlyzer_empresas")
+        db.execute("DELETE FROM meta WHERE nome = 'teamlyzer_empresas'")
+        db.commit()
+
+
+def correr(emprego, comando, n, max_pedidos, saida):
+    """
+    Corre um comando e devolve o nº de itens processados (anúncios lidos
+    do catálogo, IDs pedidos ou, no list skills, páginas).
+    """
+    ids = [str(100000 + i) for i in range(min(n, max_pedidos))]
+    if comando == "top":
+        emprego.top(n, os.path.join(saida, "top.jsonl"))
+        return n
+    if comando == "search":
+        emprego.search("Lisboa", "Empresa", n, os.path.join(saida, "search.jsonl"))
+        return n
+    if comando == "type":
+        emprego.type_jobs(ids, ficheiro=os.path.join(saida, "type.jsonl"))
+        return len(ids)
+    if comando == "skills":
+        emprego.skills("2000-01-01", "2100-01-01", workers=4)
+        return n
+    if comando == "get":
+        emprego.get_jobs(ids, os.path.join(saida, "get.jsonl"))
+        return len(ids)
+    if comando == "statistics zone":
+        emprego.statistics_zone(os.path.join(saida, "stats.csv"), workers=4)
+        return n
+    if comando == "list skills":
+        emprego.list_skills("python")
+        return 1
+    raise ValueError(comando)
+
+
+def medir_comando(emprego, base, comando, n, max_pedidos, memoria):
+    with tempfile.TemporaryDirectory() as saida, redirect_stdout(io.StringIO()):
+        preparar(emprego, base)
+        inicio = time.perf_counter()
+        itens = correr(emprego, comando, n, max_pedidos, saida)
+        duracao = time.perf_counter() - inicio
+        pedidos = emprego.METRICAS.resumo()["pedidos"]
+
+        pico = None
+        if memoria:
+            preparar(emprego, base)
+            tracemalloc.start()
+            correr(emprego, comando, n, max_pedidos, saida)
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    latencias = [r for r in pedidos.values()]
+    n_pedidos = sum(r["n"] for r in latencias)
+    return {
+        "comando": comando,
+        "tamanho": n,
+        "itens": itens,
+        "duracao_s": round(duracao, 3),
+        "itens_por_s": round(itens / duracao, 1) if duracao else None,
+        "pedidos": n_pedidos,
+        "p50_ms": max((r["p50_ms"] for r in latencias), default=None),
+        "p95_ms": max((r["p95_ms"] for r in latencias), default=None),
+        "pico_mb": round(pico / 1e6, 2) if pico is not None else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tamanhos", default="1000,10000,100000", help="nº de anúncios do catálogo, separados por vírgulas")
+    ap.add_argument("--comandos", default=",".join(COMANDOS), help="comandos a medir, separados por vírgulas")
+    ap.add_argument("--max-pedidos", type=int, default=2000,
+                    help="máximo de IDs pedidos um a um por type/get (default 2000)")
+    ap.add_argument("--fixtures", help="pasta com respostas gravadas (EMPREGO_RECORD) a usar como modelo")
+    ap.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    ap.add_argument("--json", action="store_true", help="resultados em JSON Lines")
+    args = ap.parse_args()
+
+    comandos = [c.strip() for c in args.comandos.split(",") if c.strip()]
+    desconhecidos = set(comandos) - set(COMANDOS)
+    if desconhecidos:
+        ap.error(f"comandos desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    modelos, pagina_empresa = carregar_modelos(args.fixtures) if args.fixtures else ([], None)
+    if args.fixtures and not modelos:
+        print(f"Aviso: nenhum anúncio gravado em {args.fixtures}; a usar anúncios sintéticos", file=sys.stderr)
+
+    # A pasta de dados (cache, armazém) do benchmark é temporária
+    os.environ["EMPREGO_DATA_DIR"] = tempfile.mkdtemp(prefix="emprego-bench-")
+    import emprego
+
+    if not args.json:
+        print(f"{'comando':<16}{'anúncios':>9}{'itens':>8}{'tempo s':>9}{'itens/s':>10}"
+              f"{'pedidos':>9}{'p50 ms':>8}{'p95 ms':>8}{'pico MB':>9}")
+    for n in (int(t) for t in args.tamanhos.split(",")):
+        processo, porta = arrancar_servidor(n, modelos, pagina_empresa)
+        try:
+            for comando in comandos:
+                r = medir_comando(emprego, f"http://127.0.0.1:{porta}", comando, n,
+                                  args.max_pedidos, not args.sem_memoria)
+                if args.json:
+                    print(json.dumps(r, ensure_ascii=False), flush=True)
+                else:
+                    pico = f"{r['pico_mb']:.1f}" if r["pico_mb"] is not None else "-"
+                    print(f"{comando:<16}{n:>9}{r['itens']:>8}{r['duracao_s']:>9.2f}{r['itens_por_s']:>10.1f}"
+                          f"{r['pedidos']:>9}{r['p50_ms'] or 0:>8.1f}{r['p95_ms'] or 0:>8.1f}{pico:>9}", flush=True)
+        finally:
+            processo.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark do parsing das páginas de empresas do Teamlyzer.
+
+Compara o parser original (BeautifulSoup) com o extrator direto em lxml
+sobre páginas guardadas em disco e confirma que ambos devolvem o mesmo.
+
+Uso:
+  python benchmarks/bench_teamlyzer_parse.py PASTA_COM_HTML [--repeticoes N]
+
+Sem pasta, usa uma página sintética com o tamanho aproximado de uma página real.
+Para guardar páginas reais:
+  curl -s https://pt.teamlyzer.com/companies/<empresa> -o paginas/<empresa>.html
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import emprego  # noqa: E402
+
+
+def pagina_sintetica():
+    linhas = ['<html><head><meta name="description" content="Empresa de exemplo"></head><body>']
+    for i in range(400):
+        linhas.append(f'<div class="review"><p>Review {i}: ambiente bom, equipa 3,{i % 10}</p>'
+                      f'<ul><li>Seguro</li><li>Remoto</li></ul></div>')
+    linhas.append('<ul><li>Seguro de saúde</li><li>Ginásio</li><li>Formação</li><li>Bónus</li></ul>')
+    linhas.append('<span>Salário médio: 1800€</span></body></html>')
+    return "".join(linhas)
+
+
+# Páginas fora do comum que ambos os parsers têm de aceitar (e em que têm
+# de concordar): declaração XML com encoding e documento só com um comentário
+PAGINAS_LIMITE = [
+    '<?xml version="1.0" encoding="utf-8"?><html><head><meta name="description" content="D"></head>'
+    '<body><p>Rating 4,5</p><ul><li>a</li><li>b</li><li>c</li></ul></body></html>',
+    "<?xml version='1.0' encoding='iso-8859-1'?>\n<html><body><span>Salário 1000€</span></body></html>",
+    "<!-- Rating 3,5 -->",
+    "<!-- vazia -->",
+]
+
+
+def medir(parser, paginas, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for html in paginas:
+            emprego.parse_teamlyzer_page(html, parser=parser)
+    return time.perf_counter() - inicio
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pasta", nargs="?", help="pasta com ficheiros .html guardados")
+    ap.add_argument("--repeticoes", type=int, default=20)
+    args = ap.parse_args()
+
+    if args.pasta:
+        paginas = []
+        for caminho in sorted(glob.glob(os.path.join(args.pasta, "*.html"))):
+            with open(caminho, encoding="utf-8", errors="replace") as f:
+                paginas.append(f.read())
+        if not paginas:
+            print(f"Nenhum ficheiro .html em {args.pasta}")
+            sys.exit(1)
+    else:
+        paginas = [pagina_sintetica()]
+
+    diferentes = [i for i, html in enumerate(paginas)
+                  if emprego.parse_teamlyzer_page(html, "bs4") != emprego.parse_teamlyzer_page(html, "lxml")]
+    limite_diferentes = [i for i, html in enumerate(PAGINAS_LIMITE)
+                         if emprego.parse_teamlyzer_page(html, "bs4") != emprego.parse_teamlyzer_page(html, "lxml")]
+
+    n = len(paginas) * args.repeticoes
+    t_bs4 = medir("bs4", paginas, args.repeticoes)
+    t_lxml = medir("lxml", paginas, args.repeticoes)
+
+    print(f"páginas: {len(paginas)}  parses por parser: {n}")
+    print(f"bs4 : {t_bs4 * 1000 / n:8.2f} ms/página")
+    print(f"lxml: {t_lxml * 1000 / n:8.2f} ms/página  ({t_bs4 / t_lxml:.1f}x mais rápido)")
+    if diferentes:
+        print(f"AVISO: resultados diferentes em {len(diferentes)} página(s): {diferentes}")
+    if limite_diferentes:
+        print(f"AVISO: resultados diferentes em páginas-limite: {limite_diferentes}")
+
+
+if __name__ == "__main__":
+    main()
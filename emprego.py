@@ -1,10 +1,53 @@
+import os
+import atexit
+import argparse
 import json
-import requests
+import base64
+import hashlib
+import importlib
+import sqlite3
 import sys
 import re
 import csv
-from collections import Counter
-from bs4 import BeautifulSoup
+import html
+import time
+import random
+import threading
+import unicodedata
+import concurrent.futures
+from contextlib import contextmanager
+from itertools import islice
+from collections import Counter, OrderedDict, deque
+from functools import partial, wraps
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, urlencode
+
+
+class _ModuloTardio:
+    """
+    Ocupa o lugar de um módulo pesado (requests, lxml, bs4, asyncio) e só o
+    importa no primeiro acesso a um atributo; a partir daí o nome global
+    passa a ser o próprio módulo. Assim cada comando só paga o arranque das
+    dependências que usa de facto.
+    """
+
+    def __init__(self, nome, importar=None):
+        self._nome = nome
+        self._importar = importar or nome
+
+    def __getattr__(self, atributo):
+        importlib.import_module(self._importar)
+        modulo = sys.modules[self._nome]
+        globals()[self._nome] = modulo
+        return getattr(modulo, atributo)
+
+
+requests = _ModuloTardio("requests")
+lxml = _ModuloTardio("lxml", importar="lxml.html")
+bs4 = _ModuloTardio("bs4")
+asyncio = _ModuloTardio("asyncio")
+
 
 
 # CONFIGURAÇÕES GLOBAIS
@@ -24,220 +67,1688 @@ TEAMLYZER_HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; TeamlyzerScraper/1.0)"
 }
 
+
+# MÉTRICAS (--profile)
+#
+# Contadores de pedidos HTTP (nº, bytes, estado, latência), da cache e das
+# repetições, e tempos de cada etapa (parsing, agregação, escrita...).
+# Só são recolhidos com --profile; o resumo sai no stderr no fim da execução.
+# O trabalho feito em processos (--processes) não entra nas etapas.
+
+PERFIL_ATIVO = False
+# Limites superiores (ms) dos intervalos dos histogramas de latência
+LIMITES_LATENCIA_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf")]
+
+
+class Histograma:
+    """
+    Latências num histograma de intervalos fixos (LIMITES_LATENCIA_MS),
+    com nº, total e máximo. Os percentis são o limite do intervalo onde caem.
+    """
+
+    def __init__(self):
+        self.contagens = [0] * len(LIMITES_LATENCIA_MS)
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+
+    def registar(self, segundos):
+        ms = segundos * 1000
+        self.contagens[bisect_left(LIMITES_LATENCIA_MS, ms)] += 1
+        self.n += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+
+    def percentil(self, p):
+        alvo = p * self.n
+        acumulado = 0
+        for limite, n in zip(LIMITES_LATENCIA_MS, self.contagens):
+            acumulado += n
+            if acumulado >= alvo and n:
+                return min(limite / 1000, self.maximo)
+        return self.maximo
+
+    def resumo(self):
+        return {
+            "n": self.n,
+            "total_s": round(self.total, 4),
+            "media_ms": round(self.total / self.n * 1000, 2) if self.n else 0,
+            "p50_ms": round(self.percentil(0.5) * 1000, 2),
+            "p95_ms": round(self.percentil(0.95) * 1000, 2),
+            "max_ms": round(self.maximo * 1000, 2),
+            "histograma_ms": {str(limite): n for limite, n in zip(LIMITES_LATENCIA_MS, self.contagens) if n},
+        }
+
+
+class Metricas:
+    """
+    Métricas de uma execução, partilhadas entre threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inicio = time.perf_counter()
+        self.pedidos = {}       # host -> {"bytes", "estados", "latencia"}
+        self.repeticoes = Counter()
+        self.cache = Counter()  # fresca / revalidada / descarregada / desligada
+        self.detalhe = Counter()  # origem do detalhe dos jobs: conhecido / armazém / listagem / get
+        self.etapas = {}        # nome -> Histograma
+
+    def pedido(self, host, estado, n_bytes, segundos):
+        with self.lock:
+            dados = self.pedidos.setdefault(host, {"bytes": 0, "estados": Counter(), "latencia": Histograma()})
+            dados["bytes"] += n_bytes
+            dados["estados"][estado] += 1
+            dados["latencia"].registar(segundos)
+
+    def repeticao(self, host):
+        with self.lock:
+            self.repeticoes[host] += 1
+
+    def resultado_cache(self, tipo):
+        with self.lock:
+            self.cache[tipo] += 1
+
+    def detalhe_job(self, origem, n=1):
+        with self.lock:
+            self.detalhe[origem] += n
+
+    def etapa(self, nome, segundos):
+        with self.lock:
+            self.etapas.setdefault(nome, Histograma()).registar(segundos)
+
+    def resumo(self):
+        with self.lock:
+            consultas = sum(self.cache.values())
+            return {
+                "duracao_s": round(time.perf_counter() - self.inicio, 3),
+                "pedidos": {
+                    host: {
+                        "bytes": dados["bytes"],
+                        "estados": {str(k): v for k, v in dados["estados"].items()},
+                        "repeticoes": self.repeticoes[host],
+                        **dados["latencia"].resumo(),
+                    }
+                    for host, dados in self.pedidos.items()
+                },
+                "cache": {
+                    **self.cache,
+                    "taxa_acertos": round((self.cache["fresca"] + self.cache["revalidada"]) / consultas, 3)
+                    if consultas else 0,
+                },
+                "detalhe_jobs": dict(self.detalhe),
+                "etapas": {nome: hist.resumo() for nome, hist in self.etapas.items()},
+            }
+
+
+METRICAS = Metricas()
+
+
+class _Cronometro:
+    """
+    Context manager que regista a duração do bloco na etapa `nome`.
+    """
+    __slots__ = ("nome", "inicio")
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc):
+        METRICAS.etapa(self.nome, time.perf_counter() - self.inicio)
+
+
+class _SemCronometro:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_SEM_CRONOMETRO = _SemCronometro()
+
+
+def medir(nome):
+    """
+    `with medir("etapa"):` mede o bloco quando --profile está ativo
+    (sem custo quando não está).
+    """
+    return _Cronometro(nome) if PERFIL_ATIVO else _SEM_CRONOMETRO
+
+
+def cronometrado(nome):
+    """
+    Decorador: mede cada chamada da função como a etapa `nome`.
+    """
+    def decorador(func):
+        @wraps(func)
+        def medida(*args, **kwargs):
+            if not PERFIL_ATIVO:
+                return func(*args, **kwargs)
+            with _Cronometro(nome):
+                return func(*args, **kwargs)
+        return medida
+    return decorador
+
+
+def imprimir_perfil(formato="tabela", ficheiro=sys.stderr):
+    """
+    Escreve o resumo das métricas em tabela ou JSON.
+    """
+    resumo = METRICAS.resumo()
+    if formato == "json":
+        print(json.dumps(resumo, indent=2, ensure_ascii=False), file=ficheiro)
+        return
+
+    print(f"\n--- perfil ({resumo['duracao_s']}s) ---", file=ficheiro)
+    cabecalho = f"{'':<28}{'n':>7}{'total s':>10}{'média ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'máx ms':>9}"
+    print(cabecalho, file=ficheiro)
+    for titulo, linhas in (("pedidos", resumo["pedidos"]), ("etapas", resumo["etapas"])):
+        for nome, r in linhas.items():
+            print(f"{titulo[0]} {nome[:26]:<26}{r['n']:>7}{r['total_s']:>10.3f}{r['media_ms']:>10.2f}"
+                  f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['max_ms']:>9.1f}", file=ficheiro)
+    for host, r in resumo["pedidos"].items():
+        estados = ", ".join(f"{k}: {v}" for k, v in sorted(r["estados"].items()))
+        print(f"{host}: {r['bytes'] / 1e6:.2f} MB, {r['repeticoes']} repetições, estados {estados}", file=ficheiro)
+    cache = resumo["cache"]
+    if any(k != "taxa_acertos" for k in cache):
+        detalhe = ", ".join(f"{k}: {v}" for k, v in cache.items() if k != "taxa_acertos")
+        print(f"cache: {detalhe} (taxa de acertos {cache['taxa_acertos']:.0%})", file=ficheiro)
+    if resumo["detalhe_jobs"]:
+        detalhe = ", ".join(f"{k}: {v}" for k, v in resumo["detalhe_jobs"].items())
+        print(f"detalhe de jobs: {detalhe}", file=ficheiro)
+
+
+# CLIENTE HTTP PARTILHADO
+#
+# Todos os pedidos (itjobs.pt e Teamlyzer) passam por http_get(), que mantém
+# uma sessão (pool keep-alive) por host, limita o nº de pedidos simultâneos
+# e o ritmo de pedidos por host e trata das repetições com backoff num só
+# sítio. O ritmo adapta-se: baixa quando o host responde 403/429 e volta a
+# subir aos poucos com respostas boas; se o host falhar seguidamente, o
+# circuito abre e os pedidos seguintes falham logo em vez de martelar.
+
+MAX_CONEXOES_POR_HOST = 8
+MAX_TENTATIVAS = 4
+BACKOFF_BASE = 0.5          # segundos; duplica a cada tentativa (com jitter)
+BACKOFF_MAX = 30.0          # teto do backoff e do Retry-After respeitado
+STATUS_REPETIR = {403, 429, 500, 502, 503, 504}
+STATUS_ABRANDAR = {403, 429}
+
+# Máximo de pedidos por segundo a cada host (None = sem limite)
+PEDIDOS_POR_SEGUNDO = {
+    urlsplit(URL).netloc: 5,
+    urlsplit(TEAMLYZER_BASE).netloc: 2,
+}
+TAXA_MINIMA = 0.2           # pedidos/s abaixo da qual o ritmo nunca desce
+RAJADA_MAXIMA = 5           # pedidos que podem sair de seguida após uma pausa
+
+# Circuit breaker: nº de falhas seguidas que abre o circuito e tempo
+# que fica aberto antes de deixar passar um pedido de teste
+FALHAS_ABRIR_CIRCUITO = 8
+CIRCUITO_PAUSA = 60.0
+
+_sessoes = {}
+_semaforos = {}
+_limitadores = {}
+_lock_sessoes = threading.Lock()
+
+
+_classe_circuito_aberto = None
+
+
+def _circuito_aberto(mensagem):
+    """
+    Erro CircuitoAberto: o host falhou demasiadas vezes seguidas e os
+    pedidos estão suspensos. A classe (subclasse de requests.RequestException)
+    só é criada aqui, para não obrigar a importar o requests no arranque.
+    """
+    global _classe_circuito_aberto
+    if _classe_circuito_aberto is None:
+        _classe_circuito_aberto = type("CircuitoAberto", (requests.RequestException,), {
+            "__module__": __name__,
+            "__doc__": "O host falhou demasiadas vezes seguidas; os pedidos estão suspensos.",
+        })
+    return _classe_circuito_aberto(mensagem)
+
+
+def __getattr__(nome):
+    # emprego.CircuitoAberto para quem importa o módulo
+    if nome == "CircuitoAberto":
+        return type(_circuito_aberto(""))
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+
+
+class LimitadorHost:
+    """
+    Token bucket de um host, partilhado entre threads.
+    A taxa começa em PEDIDOS_POR_SEGUNDO e adapta-se (AIMD): cai para
+    metade a cada 403/429 e sobe 10% do valor inicial a cada resposta boa.
+    Também guarda o estado do circuit breaker do host.
+    """
+
+    def __init__(self, taxa):
+        self.taxa_maxima = taxa
+        self.taxa = taxa
+        self.capacidade = min(RAJADA_MAXIMA, taxa) if taxa else 0
+        self.tokens = self.capacidade
+        self.atualizado = time.monotonic()
+        self.pausa_ate = 0.0
+        self.falhas = 0
+        self.aberto_ate = None
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        """
+        Bloqueia até haver um token (e até passar qualquer pausa pedida
+        pelo host). Lança CircuitoAberto se o circuito estiver aberto.
+        """
+        with self.lock:
+            agora = time.monotonic()
+            if self.aberto_ate is not None:
+                if agora < self.aberto_ate:
+                    raise _circuito_aberto(
+                        f"demasiadas falhas seguidas; pedidos suspensos durante mais "
+                        f"{self.aberto_ate - agora:.0f}s")
+                # meio-aberto: deixa passar um pedido de teste; outra falha volta a abrir
+                self.aberto_ate = None
+                self.falhas = FALHAS_ABRIR_CIRCUITO - 1
+            if not self.taxa:
+                espera = max(0.0, self.pausa_ate - agora)
+            else:
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+                self.atualizado = agora
+                self.tokens -= 1
+                # tokens negativos = pedidos já reservados à frente deste
+                espera = max(-self.tokens / self.taxa, self.pausa_ate - agora)
+        if espera > 0:
+            time.sleep(espera)
+
+    def sucesso(self):
+        with self.lock:
+            self.falhas = 0
+            if self.taxa:
+                self.taxa = min(self.taxa_maxima, self.taxa + 0.1 * self.taxa_maxima)
+
+    def falha(self, abrandar=False, pausa=0.0):
+        """
+        Regista uma falha. Com `abrandar` (403/429) reduz a taxa; com
+        `pausa` (Retry-After) suspende todos os pedidos ao host até lá.
+        """
+        with self.lock:
+            agora = time.monotonic()
+            if abrandar and self.taxa:
+                self.taxa = max(TAXA_MINIMA, self.taxa / 2)
+            if pausa:
+                self.pausa_ate = max(self.pausa_ate, agora + pausa)
+            self.falhas += 1
+            if self.falhas >= FALHAS_ABRIR_CIRCUITO:
+                self.aberto_ate = agora + CIRCUITO_PAUSA
+
+
+def _obter_sessao(host):
+    """
+    Devolve (sessão, semáforo, limitador) do host, criando-os na primeira
+    utilização.
+    """
+    with _lock_sessoes:
+        if host not in _sessoes:
+            sessao = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONEXOES_POR_HOST)
+            sessao.mount("https://", adapter)
+            sessao.mount("http://", adapter)
+            _sessoes[host] = sessao
+            _semaforos[host] = threading.BoundedSemaphore(MAX_CONEXOES_POR_HOST)
+            _limitadores[host] = LimitadorHost(PEDIDOS_POR_SEGUNDO.get(host))
+        return _sessoes[host], _semaforos[host], _limitadores[host]
+
+
+def _retry_after(response):
+    """
+    Segundos pedidos pelo header Retry-After (número ou data HTTP), ou 0.
+    """
+    valor = response.headers.get("Retry-After")
+    if not valor:
+        return 0.0
+    try:
+        segundos = float(valor)
+    except ValueError:
+        # data HTTP: raro, por isso o email.utils só é importado aqui
+        from datetime import datetime, timezone
+        from email.utils import parsedate_to_datetime
+        try:
+            segundos = (parsedate_to_datetime(valor) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return 0.0
+    return min(max(segundos, 0.0), BACKOFF_MAX)
+
+
+# Gravação / reprodução de respostas (fixtures para testes e benchmarks)
+#
+# EMPREGO_RECORD=PASTA grava cada resposta recebida num ficheiro JSON;
+# EMPREGO_REPLAY=PASTA responde a partir dessas gravações sem tocar na rede
+# (um pedido sem gravação dá erro de ligação). A api_key nunca é gravada.
+GRAVAR_EM = os.environ.get("EMPREGO_RECORD") or None
+REPRODUZIR_DE = os.environ.get("EMPREGO_REPLAY") or None
+HEADERS_GRAVADOS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+
+def _ficheiro_gravacao(pasta, url, params):
+    """
+    Caminho da gravação de um pedido: PASTA/<host>/<caminho>/<hash>.json
+    (o hash é do URL com os parâmetros, sem a api_key).
+    """
+    partes = urlsplit(url)
+    chave = _chave_cache(url, params)
+    resumo = hashlib.sha1(chave.encode("utf-8")).hexdigest()[:16]
+    caminho = partes.path.strip("/").replace("/", "_").replace(".", "_") or "raiz"
+    return os.path.join(pasta, partes.netloc.replace(":", "_"), caminho, f"{resumo}.json")
+
+
+def _gravar_resposta(url, params, response):
+    ficheiro = _ficheiro_gravacao(GRAVAR_EM, url, params)
+    os.makedirs(os.path.dirname(ficheiro), exist_ok=True)
+    try:
+        corpo, codificacao = response.content.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        corpo, codificacao = base64.b64encode(response.content).decode("ascii"), "base64"
+    gravacao = {
+        "pedido": _chave_cache(url, params),
+        "status": response.status_code,
+        "headers": {h: response.headers[h] for h in HEADERS_GRAVADOS if h in response.headers},
+        "codificacao": codificacao,
+        "corpo": corpo,
+    }
+    with open(ficheiro, "w", encoding="utf-8") as f:
+        json.dump(gravacao, f, ensure_ascii=False)
+
+
+def _resposta_gravada(url, params):
+    """
+    Reconstrói a resposta gravada para o pedido, ou lança ConnectionError.
+    """
+    ficheiro = _ficheiro_gravacao(REPRODUZIR_DE, url, params)
+    try:
+        with open(ficheiro, encoding="utf-8") as f:
+            gravacao = json.load(f)
+    except FileNotFoundError:
+        raise requests.ConnectionError(f"sem gravação para {_chave_cache(url, params)} em {REPRODUZIR_DE}")
+    response = requests.Response()
+    response.url = url
+    response.status_code = gravacao["status"]
+    if gravacao["codificacao"] == "base64":
+        response._content = base64.b64decode(gravacao["corpo"])
+    else:
+        response._content = gravacao["corpo"].encode("utf-8")
+    response.headers = requests.structures.CaseInsensitiveDict(gravacao["headers"])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+def _pedir(url, params, headers, timeout):
+    """
+    Faz o pedido pela sessão partilhada do host, ao ritmo do seu limitador.
+    Repete em 403/429/5xx e erros de ligação com backoff exponencial com
+    jitter, ou o tempo indicado pelo Retry-After se o host o mandar.
+    Num 403 (Cloudflare) as tentativas seguintes vão sem os headers
+    personalizados, tal como a "alternativa" que cada comando fazia antes.
+    Devolve a última resposta; erros de ligação na última tentativa são
+    relançados, e CircuitoAberto se o host estiver suspenso.
+    """
+    if REPRODUZIR_DE:
+        return _resposta_gravada(url, params)
+
+    host = urlsplit(url).netloc
+    sessao, semaforo, limitador = _obter_sessao(host)
+
+    for tentativa in range(MAX_TENTATIVAS):
+        ultima = tentativa == MAX_TENTATIVAS - 1
+        if tentativa and PERFIL_ATIVO:
+            METRICAS.repeticao(host)
+        with medir("espera do limitador"):
+            limitador.esperar()
+        pausa = 0.0
+        inicio = time.perf_counter()
+        try:
+            with semaforo:
+                response = sessao.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if PERFIL_ATIVO:
+                METRICAS.pedido(host, type(e).__name__, 0, time.perf_counter() - inicio)
+            limitador.falha()
+            if ultima:
+                raise
+        else:
+            if PERFIL_ATIVO:
+                METRICAS.pedido(host, response.status_code, len(response.content), time.perf_counter() - inicio)
+            if response.status_code not in STATUS_REPETIR:
+                limitador.sucesso()
+                if GRAVAR_EM and response.status_code != 304:
+                    _gravar_resposta(url, params, response)
+                return response
+            pausa = _retry_after(response)
+            limitador.falha(abrandar=response.status_code in STATUS_ABRANDAR, pausa=pausa)
+            if ultima:
+                return response
+            if response.status_code == 403:
+                print("ERRO: API bloqueada pelo Cloudflare. A tentar alternativa...", file=sys.stderr)
+                headers = None
+
+        # Com Retry-After a pausa fica no limitador (vale para todas as threads);
+        # senão, "full jitter" para as threads não voltarem todas ao mesmo tempo
+        if not pausa:
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** tentativa)))
+
+
+def http_get(url, params=None, headers=None, timeout=10, cache=True, revalidar=False):
+    """
+    GET através do cliente partilhado, passando pela cache em disco.
+    Uma entrada dentro do TTL é devolvida sem tocar na rede; uma entrada
+    expirada (ou qualquer entrada, com revalidar=True) é revalidada com
+    If-None-Match / If-Modified-Since e um 304 reaproveita o corpo guardado.
+    """
+    if not (cache and CACHE_ATIVA):
+        if PERFIL_ATIVO:
+            METRICAS.resultado_cache("desligada")
+        return _pedir(url, params, headers, timeout)
+
+    chave = _chave_cache(url, params)
+    entrada = _cache_ler(chave)
+
+    if entrada is not None:
+        if not (CACHE_REFRESH or revalidar) and time.time() - entrada["guardado_em"] < _ttl_cache(url):
+            if PERFIL_ATIVO:
+                METRICAS.resultado_cache("fresca")
+            return _resposta_da_cache(url, entrada)
+
+        headers = dict(headers or {})
+        if entrada["etag"]:
+            headers["If-None-Match"] = entrada["etag"]
+        if entrada["last_modified"]:
+            headers["If-Modified-Since"] = entrada["last_modified"]
+
+    response = _pedir(url, params, headers, timeout)
+
+    if response.status_code == 304 and entrada is not None:
+        if PERFIL_ATIVO:
+            METRICAS.resultado_cache("revalidada")
+        _cache_renovar(chave)
+        return _resposta_da_cache(url, entrada)
+    if PERFIL_ATIVO:
+        METRICAS.resultado_cache("descarregada")
+    if response.status_code == 200:
+        _cache_guardar(chave, response)
+    return response
+
+
+# CACHE EM DISCO
+#
+# Respostas guardadas em SQLite, indexadas por URL + parâmetros (sem a api_key).
+# Cada endpoint tem o seu TTL; quando a cache passa de CACHE_MAX_BYTES saem
+# primeiro as entradas usadas há mais tempo (LRU), até ficar em
+# CACHE_ALVO_BYTES. O total de bytes é mantido na tabela meta (somar a
+# coluna a cada escrita obrigaria a ler a tabela inteira) e os acessos
+# para o LRU são gravados em lotes.
+
+DATA_DIR = os.environ.get("EMPREGO_DATA_DIR", ".emprego")
+CACHE_DB = os.path.join(DATA_DIR, "cache.sqlite")
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_ALVO_BYTES = int(CACHE_MAX_BYTES * 0.9)
+CACHE_USOS_LOTE = 100   # acessos acumulados antes de atualizar usado_em
+
+# TTL em segundos por caminho; ganha o primeiro prefixo que coincidir
+CACHE_TTL = [
+    ("/job/get.json", 24 * 3600),
+    ("/job/list.json", 10 * 60),
+    ("/job/search.json", 10 * 60),
+    ("/companies/ranking", 24 * 3600),
+    ("/companies/jobs", 24 * 3600),
+    ("/companies/", 7 * 24 * 3600),
+]
+CACHE_TTL_DEFAULT = 3600
+
+CACHE_ATIVA = True      # --no-cache desliga
+CACHE_REFRESH = False   # --refresh ignora o TTL e revalida tudo
+
+_cache_conn = None
+_lock_cache = threading.Lock()
+_cache_usos = {}        # chave -> instante do último acesso ainda não gravado
+
+
+def _cache_db():
+    """
+    Abre (uma vez) a base de dados da cache.
+    """
+    global _cache_conn
+    if _cache_conn is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        _cache_conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _cache_conn.execute("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                status INTEGER,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                corpo BLOB,
+                tamanho INTEGER,
+                guardado_em REAL,
+                usado_em REAL
+            )
+        """)
+        _cache_conn.execute("CREATE INDEX IF NOT EXISTS respostas_usado_em ON respostas (usado_em)")
+        _cache_conn.execute("CREATE TABLE IF NOT EXISTS meta (nome TEXT PRIMARY KEY, valor TEXT)")
+        _cache_conn.execute("""
+            CREATE TABLE IF NOT EXISTS teamlyzer_empresas (
+                posicao INTEGER PRIMARY KEY, chave TEXT, href TEXT
+            )
+        """)
+        _cache_conn.execute("""
+            CREATE TABLE IF NOT EXISTS teamlyzer_perfis (
+                url TEXT PRIMARY KEY, dados TEXT, obtido_em REAL
+            )
+        """)
+        # Caches criadas antes do total em meta: soma-se uma vez
+        if _cache_conn.execute("SELECT 1 FROM meta WHERE nome = 'bytes'").fetchone() is None:
+            _cache_conn.execute(
+                "INSERT INTO meta VALUES ('bytes', (SELECT COALESCE(SUM(tamanho), 0) FROM respostas))"
+            )
+            _cache_conn.commit()
+        atexit.register(_cache_gravar_usos)
+    return _cache_conn
+
+
+def _chave_cache(url, params):
+    params = sorted((k, str(v)) for k, v in (params or {}).items() if k != "api_key")
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+def _ttl_cache(url):
+    caminho = urlsplit(url).path
+    for prefixo, ttl in CACHE_TTL:
+        if caminho.startswith(prefixo):
+            return ttl
+    return CACHE_TTL_DEFAULT
+
+
+def _cache_ler(chave):
+    with _lock_cache:
+        db = _cache_db()
+        row = db.execute(
+            "SELECT status, content_type, etag, last_modified, corpo, guardado_em "
+            "FROM respostas WHERE chave = ?", (chave,)
+        ).fetchone()
+        if row is None:
+            return None
+        _cache_usos[chave] = time.time()
+        if len(_cache_usos) >= CACHE_USOS_LOTE:
+            _cache_gravar_usos(db)
+            db.commit()
+
+    campos = ("status", "content_type", "etag", "last_modified", "corpo", "guardado_em")
+    return dict(zip(campos, row))
+
+
+def _cache_gravar_usos(db=None):
+    """
+    Grava em usado_em os acessos acumulados (chamar com _lock_cache, exceto
+    à saída do programa).
+    """
+    if not _cache_usos:
+        return
+    usos = [(usado_em, chave) for chave, usado_em in _cache_usos.items()]
+    _cache_usos.clear()
+    (db or _cache_db()).executemany("UPDATE respostas SET usado_em = ? WHERE chave = ?", usos)
+    if db is None:
+        _cache_db().commit()
+
+
+def _cache_renovar(chave):
+    agora = time.time()
+    with _lock_cache:
+        db = _cache_db()
+        _cache_usos.pop(chave, None)
+        db.execute("UPDATE respostas SET guardado_em = ?, usado_em = ? WHERE chave = ?", (agora, agora, chave))
+        db.commit()
+
+
+def _cache_guardar(chave, response):
+    corpo = response.content
+    agora = time.time()
+    with _lock_cache:
+        db = _cache_db()
+        _cache_usos.pop(chave, None)
+        anterior = db.execute("SELECT tamanho FROM respostas WHERE chave = ?", (chave,)).fetchone()
+        db.execute(
+            "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (chave, response.status_code, response.headers.get("Content-Type"),
+             response.headers.get("ETag"), response.headers.get("Last-Modified"),
+             corpo, len(corpo), agora, agora),
+        )
+        total = _cache_somar_bytes(db, len(corpo) - (anterior[0] if anterior else 0))
+        if total > CACHE_MAX_BYTES:
+            _cache_despejar(db, total)
+        db.commit()
+
+
+def _cache_somar_bytes(db, delta):
+    """
+    Soma delta ao total de bytes guardado em meta e devolve o novo total.
+    """
+    db.execute("UPDATE meta SET valor = CAST(valor AS INTEGER) + ? WHERE nome = 'bytes'", (delta,))
+    return int(db.execute("SELECT valor FROM meta WHERE nome = 'bytes'").fetchone()[0])
+
+
+def _cache_despejar(db, total):
+    """
+    Remove as entradas menos usadas recentemente até a cache ficar em
+    CACHE_ALVO_BYTES (abaixo do máximo, para não despejar a cada escrita).
+    """
+    _cache_gravar_usos(db)
+    removidas = []
+    for chave, tamanho in db.execute("SELECT chave, tamanho FROM respostas ORDER BY usado_em"):
+        removidas.append((chave,))
+        total -= tamanho
+        if total <= CACHE_ALVO_BYTES:
+            break
+    db.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+    db.execute("UPDATE meta SET valor = ? WHERE nome = 'bytes'", (total,))
+
+
+def _resposta_da_cache(url, entrada):
+    """
+    Reconstrói um requests.Response a partir de uma entrada da cache.
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = entrada["status"]
+    response._content = entrada["corpo"]
+    response.headers = requests.structures.CaseInsensitiveDict()
+    if entrada["content_type"]:
+        response.headers["Content-Type"] = entrada["content_type"]
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+
+# PAGINAÇÃO DA API itjobs.pt
+
+TAMANHO_PAGINA = 100
+
+
+class ApiError(Exception):
+    """
+    A API do itjobs.pt respondeu com um campo "error".
+    """
+
+
+@cronometrado("página api")
+def _obter_pagina(url, params, page, revalidar=False):
+    """
+    Pede uma página e devolve o JSON da resposta.
+    """
+    response = http_get(url, params={**params, "page": page}, headers=HEADERS, revalidar=revalidar)
+    response.raise_for_status()
+    data = response.json()
+
+    if "error" in data:
+        raise ApiError(data["error"])
+    return data
+
+
+def _iter_paginas(url, params, page_size, workers, revalidar=False):
+    """
+    Devolve a lista de resultados de cada página, por ordem.
+    Com workers > 1, depois da 1ª página (que diz o total) mantém até
+    `workers` páginas seguintes a ser pedidas em paralelo, mas entrega-as
+    sempre pela ordem original.
+    """
+    data = _obter_pagina(url, params, 1, revalidar)
+    results = data.get("results", []) or []
+    yield results
+
+    total = data.get("total")
+    if len(results) < page_size or (total is not None and page_size >= int(total)):
+        return
+
+    if workers <= 1 or total is None:
+        page = 2
+        while True:
+            data = _obter_pagina(url, params, page, revalidar)
+            results = data.get("results", []) or []
+            yield results
+            total = data.get("total")
+            if len(results) < page_size or (total is not None and page * page_size >= int(total)):
+                return
+            page += 1
+
+    n_paginas = -(-int(total) // page_size)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pendentes = deque()
+    proxima = 2
+    try:
+        while proxima <= n_paginas and len(pendentes) < workers:
+            pendentes.append(pool.submit(_obter_pagina, url, params, proxima, revalidar))
+            proxima += 1
+
+        while pendentes:
+            results = pendentes.popleft().result().get("results", []) or []
+            if proxima <= n_paginas:
+                pendentes.append(pool.submit(_obter_pagina, url, params, proxima, revalidar))
+                proxima += 1
+            yield results
+            # O catálogo encolheu entretanto: não há mais nada a seguir
+            if len(results) < page_size:
+                return
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Últimos anúncios vistos em listagens/pesquisas nesta execução (até
+# JOBS_VISTOS_MAX), para o detalhe de um job não voltar a ser pedido
+JOBS_VISTOS_MAX = 5000
+_jobs_vistos = OrderedDict()    # id (str) -> anúncio
+_lock_vistos = threading.Lock()
+
+
+def _lembrar_jobs(jobs):
+    with _lock_vistos:
+        for job in jobs:
+            if job.get("id") is not None:
+                _jobs_vistos[str(job["id"])] = job
+                _jobs_vistos.move_to_end(str(job["id"]))
+        while len(_jobs_vistos) > JOBS_VISTOS_MAX:
+            _jobs_vistos.popitem(last=False)
+
+
+def _job_visto(job_id):
+    with _lock_vistos:
+        return _jobs_vistos.get(str(job_id))
+
+
+def iter_jobs(endpoint, params=None, page_size=TAMANHO_PAGINA, max_jobs=None, workers=1, revalidar=False):
+    """
+    Percorre /job/<endpoint>.json página a página e devolve os anúncios um a um.
+    Só pede a página seguinte quando o consumidor precisar dela, por isso
+    parar a iteração (ou atingir max_jobs) não gasta pedidos extra.
+    Com workers > 1 pede várias páginas em avanço (útil para varrer o
+    catálogo inteiro), respeitando o limite PEDIDOS_POR_SEGUNDO do host.
+    Com revalidar=True as páginas em cache são sempre revalidadas na origem.
+    Exemplo:
+      for job in iter_jobs("search", {"q": "KCS IT"}): ...
+      for job in iter_jobs("list", workers=4): ...
+    """
+    url = f"{URL}/job/{endpoint}.json"
+    if max_jobs is not None:
+        if max_jobs <= 0:
+            return
+        page_size = min(page_size, max_jobs)
+
+    base_params = dict(params or {})
+    base_params.update({"api_key": API_KEY, "limit": page_size})
+
+    devolvidos = 0
+    for results in _iter_paginas(url, base_params, page_size, workers, revalidar):
+        _lembrar_jobs(results)
+        for job in results:
+            yield job
+            devolvidos += 1
+            if max_jobs is not None and devolvidos >= max_jobs:
+                return
+
+# EXECUÇÃO CONCORRENTE
+
+def map_concorrente(func, items, workers):
+    """
+    Aplica func a cada item com até `workers` threads.
+    Os resultados saem pela ordem dos itens, à medida que ficam prontos,
+    e nunca há mais de 2*workers itens em curso (memória constante).
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pendentes = deque()
+        for item in items:
+            pendentes.append(pool.submit(func, item))
+            if len(pendentes) >= 2 * workers:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+
+def _aplicar_lote(func, lote):
+    return [func(item) for item in lote]
+
+
+def map_processos(func, items, processos, chunksize=64):
+    """
+    Como map_concorrente, mas para trabalho de CPU: aplica func em
+    `processos` processos, em lotes de `chunksize` itens (menos overhead de
+    pickling). Os resultados saem pela ordem dos itens e nunca há mais de
+    2*processos lotes em curso, por isso funciona com geradores longos.
+    func tem de ser uma função ao nível do módulo (picklable).
+    """
+    if processos <= 0:
+        yield from map(func, items)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processos) as pool:
+        pendentes = deque()
+        iterador = iter(items)
+        while True:
+            lote = list(islice(iterador, chunksize))
+            if lote:
+                pendentes.append(pool.submit(_aplicar_lote, func, lote))
+            if pendentes and (not lote or len(pendentes) >= 2 * processos):
+                yield from pendentes.popleft().result()
+            if not lote and not pendentes:
+                return
+
+
+class PedidosPartilhados:
+    """
+    Garante que cada chave é calculada uma só vez: se várias threads pedirem
+    a mesma chave ao mesmo tempo, só a primeira faz o trabalho e as outras
+    esperam pelo resultado dela.
+    """
+
+    def __init__(self):
+        self._futuros = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, func, *args):
+        with self._lock:
+            futuro = self._futuros.get(chave)
+            dono = futuro is None
+            if dono:
+                futuro = self._futuros[chave] = Future()
+
+        if dono:
+            try:
+                futuro.set_result(func(*args))
+            except Exception as e:
+                futuro.set_exception(e)
+        return futuro.result()
+
+    def esquecer(self, chave):
+        """
+        Descarta o resultado guardado de `chave` (o próximo obter recalcula).
+        """
+        with self._lock:
+            self._futuros.pop(chave, None)
+
+
+# De quantos em quantos registos as saídas em ficheiro são despejadas para disco
+FLUSH_A_CADA = 100
+
+
+def _formato_saida(ficheiro):
+    """
+    "csv" para ficheiros .csv, "jsonl" para tudo o resto (incluindo stdout).
+    """
+    return "csv" if ficheiro and ficheiro.lower().endswith(".csv") else "jsonl"
+
+
+@contextmanager
+def abrir_saida(ficheiro, fieldnames, formato=None, flush_every=FLUSH_A_CADA, acrescentar=False):
+    """
+    Abre a saída de um comando e devolve uma função escrever(registo).
+    - formato "csv": uma linha por registo, só com `fieldnames`
+    - formato "jsonl": um objeto JSON por linha
+    Por omissão o formato vem da extensão do ficheiro. Sem ficheiro escreve
+    no stdout e despeja cada linha logo (para pipelines); em ficheiro
+    despeja a cada `flush_every` registos. Com `acrescentar` o ficheiro não
+    é apagado (o cabeçalho CSV só é escrito se estiver vazio).
+    """
+    formato = formato or _formato_saida(ficheiro)
+    f = open(ficheiro, "a" if acrescentar else "w", newline="", encoding="utf-8") if ficheiro else sys.stdout
+    flush_every = flush_every if ficheiro else 1
+
+    if formato == "csv":
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        if not (acrescentar and f.tell()):
+            writer.writeheader()
+        escrever_registo = writer.writerow
+    else:
+        def escrever_registo(registo):
+            f.write(json.dumps(registo, ensure_ascii=False) + "\n")
+
+    n_escritos = 0
+
+    def escrever(registo):
+        nonlocal n_escritos
+        with medir("escrita"):
+            escrever_registo(registo)
+        n_escritos += 1
+        if n_escritos % flush_every == 0:
+            f.flush()
+
+    try:
+        yield escrever
+    finally:
+        if ficheiro:
+            f.close()
+        else:
+            f.flush()
+
+
+def ler_jobs(caminho):
+    """
+    Lê anúncios de um ficheiro JSON Lines (ou do stdin se caminho for "-"),
+    por exemplo a saída do get em lote.
+    """
+    f = sys.stdin if caminho == "-" else open(caminho, encoding="utf-8")
+    try:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def ler_ids(caminho):
+    """
+    Lê IDs de um ficheiro (ou do stdin se caminho for "-"), um ou mais por
+    linha, separados por espaços ou vírgulas. Linhas começadas por # são ignoradas.
+    """
+    f = sys.stdin if caminho == "-" else open(caminho, encoding="utf-8")
+    try:
+        for linha in f:
+            linha = linha.strip()
+            if linha and not linha.startswith("#"):
+                yield from (i for i in re.split(r"[\s,]+", linha) if i)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+# ARMAZÉM LOCAL DE ANÚNCIOS
+#
+# Cópia local dos anúncios (SQLite, chave = id do job), atualizada pelo
+# comando sync. Com --local, search/skills/statistics leem daqui em vez
+# de irem à API.
+
+ARMAZEM_DB = os.path.join(DATA_DIR, "jobs.sqlite")
+
+USAR_ARMAZEM = False    # --local liga
+
+_armazem_conn = None
+_lock_armazem = threading.Lock()
+
+
+def _armazem_db():
+    """
+    Abre (uma vez) a base de dados do armazém.
+    """
+    global _armazem_conn
+    if _armazem_conn is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        _armazem_conn = sqlite3.connect(ARMAZEM_DB, check_same_thread=False)
+        _armazem_conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                published_at TEXT,
+                updated_at TEXT,
+                company TEXT,
+                title TEXT,
+                dados TEXT
+            )
+        """)
+        _armazem_conn.execute("CREATE INDEX IF NOT EXISTS jobs_published_at ON jobs (published_at)")
+        _armazem_conn.execute("CREATE TABLE IF NOT EXISTS meta (nome TEXT PRIMARY KEY, valor TEXT)")
+        _criar_indices(_armazem_conn)
+    return _armazem_conn
+
+
+# ÍNDICES DE PESQUISA DO ARMAZÉM
+#
+# Empresa, localizações e tipos normalizados ficam em tabelas indexadas,
+# para o search --local responder por interseção de índices; título e
+# descrição ficam num índice de texto integral (FTS5, se existir).
+
+# Muda sempre que o esquema dos índices (ou a lista de skills, ou a conversão
+# do HTML das descrições) muda, para
+# os armazéns existentes serem reindexados na próxima abertura
+VERSAO_INDICES = "3"
+
+
+def _normalizar_texto(texto):
+    """
+    Minúsculas, sem acentos nem pontuação e com espaços colapsados.
+    """
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", texto.lower()).split())
+
+
+def _criar_indices(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS job_indice (
+            job_id INTEGER PRIMARY KEY, empresa TEXT, part_time INTEGER
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS job_indice_empresa ON job_indice (empresa, part_time)")
+    db.execute("CREATE TABLE IF NOT EXISTS job_locais (job_id INTEGER, local TEXT)")
+    db.execute("CREATE INDEX IF NOT EXISTS job_locais_local ON job_locais (local, job_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS job_locais_job ON job_locais (job_id)")
+    db.execute("CREATE TABLE IF NOT EXISTS job_tipos (job_id INTEGER, tipo TEXT)")
+    db.execute("CREATE INDEX IF NOT EXISTS job_tipos_tipo ON job_tipos (tipo, job_id)")
+    db.execute("CREATE INDEX IF NOT EXISTS job_tipos_job ON job_tipos (job_id)")
+    # Contagens de skills por anúncio, com o dia de publicação, para o skills
+    # responder a qualquer janela (ou série temporal) somando baldes
+    db.execute("CREATE TABLE IF NOT EXISTS job_skills (job_id INTEGER, dia TEXT, skill TEXT, n INTEGER)")
+    db.execute("CREATE INDEX IF NOT EXISTS job_skills_dia ON job_skills (dia, skill)")
+    db.execute("CREATE INDEX IF NOT EXISTS job_skills_job ON job_skills (job_id)")
+    try:
+        db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS jobs_texto USING fts5(title, body)")
+    except sqlite3.OperationalError:
+        # SQLite sem FTS5: a pesquisa por texto cai para LIKE sobre a tabela jobs
+        pass
+
+    # Armazéns criados antes dos índices (ou com outra versão) são reindexados
+    row = db.execute("SELECT valor FROM meta WHERE nome = 'versao_indices'").fetchone()
+    versao = f"{VERSAO_INDICES}:{','.join(SKILLS_ITJOBS)}"
+    if row is None or row[0] != versao:
+        jobs = [json.loads(dados) for (dados,) in db.execute("SELECT dados FROM jobs")]
+        _indexar_jobs(db, jobs)
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('versao_indices', ?)", (versao,))
+        db.commit()
+
+
+def _tem_fts(db):
+    return db.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'jobs_texto'"
+    ).fetchone() is not None
+
+
+def _indexar_jobs(db, jobs):
+    """
+    (Re)escreve as entradas de índice dos anúncios indicados (sem commit).
+    """
+    ids = [(int(job["id"]),) for job in jobs]
+    for tabela in ("job_indice", "job_locais", "job_tipos", "job_skills"):
+        db.executemany(f"DELETE FROM {tabela} WHERE job_id = ?", ids)
+
+    db.executemany("INSERT INTO job_indice VALUES (?, ?, ?)", [
+        (int(job["id"]), _normalizar_texto((job.get("company") or {}).get("name")), int(_e_part_time(job)))
+        for job in jobs
+    ])
+    db.executemany("INSERT INTO job_locais VALUES (?, ?)", [
+        (int(job["id"]), _normalizar_texto(loc.get("name")))
+        for job in jobs for loc in (job.get("locations") or [])
+    ])
+    db.executemany("INSERT INTO job_tipos VALUES (?, ?)", [
+        (int(job["id"]), _normalizar_texto(tipo.get("name")))
+        for job in jobs for tipo in (job.get("types") or [])
+    ])
+    db.executemany("INSERT INTO job_skills VALUES (?, ?, ?, ?)", [
+        (int(job["id"]), (job.get("publishedAt") or "")[:10], skill, n)
+        for job in jobs for skill, n in MATCHER_ITJOBS.contar(_texto_skills(job)).items()
+    ])
+
+    if _tem_fts(db):
+        db.executemany("DELETE FROM jobs_texto WHERE rowid = ?", ids)
+        db.executemany("INSERT INTO jobs_texto (rowid, title, body) VALUES (?, ?, ?)", [
+            (int(job["id"]), job.get("title") or "", clean_html(job.get("body") or ""))
+            for job in jobs
+        ])
+
+
+def _condicao_prefixo(coluna, valor):
+    """
+    Condição "coluna começa por valor" que o SQLite consegue responder pelo índice.
+    """
+    return f"({coluna} >= ? AND {coluna} < ?)", [valor, valor + "\uffff"]
+
+
+def pesquisar_local(localidade=None, empresa=None, n=None, part_time=True, tipo=None, texto=None):
+    """
+    Pesquisa no armazém local por interseção dos índices de empresa,
+    localidade e tipo (todos por prefixo do nome normalizado), com
+    pesquisa opcional em texto integral no título/descrição.
+    Devolve os anúncios do mais recente para o mais antigo.
+    Exemplo:
+      pesquisar_local("Porto", "KCS IT", 3)
+    """
+    condicoes = []
+    valores = []
+    if empresa:
+        condicao, extra = _condicao_prefixo("i.empresa", _normalizar_texto(empresa))
+        condicoes.append(condicao)
+        valores += extra
+    if part_time:
+        condicoes.append("i.part_time = 1")
+    if localidade:
+        condicao, extra = _condicao_prefixo("l.local", _normalizar_texto(localidade))
+        condicoes.append(f"j.id IN (SELECT l.job_id FROM job_locais l WHERE {condicao})")
+        valores += extra
+    if tipo:
+        condicao, extra = _condicao_prefixo("t.tipo", _normalizar_texto(tipo))
+        condicoes.append(f"j.id IN (SELECT t.job_id FROM job_tipos t WHERE {condicao})")
+        valores += extra
+
+    with _lock_armazem:
+        db = _armazem_db()
+        if texto:
+            if _tem_fts(db):
+                # como frase: o texto do utilizador (p.ex. "c++") não é sintaxe FTS5
+                condicoes.append("j.id IN (SELECT rowid FROM jobs_texto WHERE jobs_texto MATCH ?)")
+                valores.append('"' + texto.replace('"', '""') + '"')
+            else:
+                condicoes.append("(j.title LIKE ? OR j.dados LIKE ?)")
+                valores += [f"%{texto}%"] * 2
+
+        sql = "SELECT j.dados FROM jobs j JOIN job_indice i ON i.job_id = j.id"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY j.published_at DESC"
+        if n is not None:
+            sql += f" LIMIT {int(n)}"
+        rows = db.execute(sql, valores).fetchall()
+
+    for (dados,) in rows:
+        yield json.loads(dados)
+
+
+def _marca_temporal(job):
+    """
+    Data mais recente do anúncio (publicação ou atualização).
+    """
+    return max(job.get("publishedAt") or "", job.get("updatedAt") or "")
+
+
+@cronometrado("armazém")
+def guardar_jobs(db, jobs):
+    """
+    Insere ou substitui anúncios no armazém (sem commit).
+    """
+    db.executemany(
+        "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?)",
+        [(int(job["id"]), job.get("publishedAt"), job.get("updatedAt"),
+          (job.get("company") or {}).get("name"), job.get("title"),
+          json.dumps(job, ensure_ascii=False))
+         for job in jobs],
+    )
+    _indexar_jobs(db, jobs)
+
+
+def sync(full=False, workers=1):
+    """
+    Atualiza o armazém local com os anúncios da itjobs.pt.
+    Os anúncios vêm do mais recente para o mais antigo; depois da primeira
+    sincronização só se pedem páginas até aparecer uma página inteira de
+    anúncios que não são mais recentes que a última marca guardada.
+    Exemplo:
+      python emprego.py sync
+      python emprego.py sync --full --workers 4
+    """
+    with _lock_armazem:
+        db = _armazem_db()
+        row = db.execute("SELECT valor FROM meta WHERE nome = 'marca'").fetchone()
+    marca = "" if full or row is None else row[0]
+
+    nova_marca = marca
+    lote = []
+    n_guardados = 0
+    antigos_seguidos = 0
+
+    try:
+        # Sem marca (1ª vez ou --full) percorre o catálogo todo, com páginas em paralelo.
+        # Páginas revalidadas na origem: uma cópia da cache escondia anúncios novos
+        for job in iter_jobs("list", workers=1 if marca else workers, revalidar=True):
+            quando = _marca_temporal(job)
+            if marca and quando <= marca:
+                antigos_seguidos += 1
+                if antigos_seguidos >= TAMANHO_PAGINA:
+                    break
+                continue
+            antigos_seguidos = 0
+
+            lote.append(job)
+            nova_marca = max(nova_marca, quando)
+            if len(lote) >= TAMANHO_PAGINA:
+                with _lock_armazem:
+                    guardar_jobs(db, lote)
+                    db.commit()
+                n_guardados += len(lote)
+                lote = []
+    except BaseException:
+        # Guarda o que já chegou, mas a marca não avança: a próxima
+        # sincronização volta a pedir o que ficou a faltar
+        with _lock_armazem:
+            guardar_jobs(db, lote)
+            db.commit()
+        raise
+
+    with _lock_armazem:
+        guardar_jobs(db, lote)
+        n_guardados += len(lote)
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('marca', ?)", (nova_marca,))
+        db.commit()
+        total = db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    print(f"{n_guardados} anúncios novos/atualizados; {total} no armazém local.")
+
+
+def iter_jobs_locais(params=None, max_jobs=None):
+    """
+    Como iter_jobs, mas lê do armazém local (do mais recente para o mais antigo).
+    Percebe os mesmos filtros usados com a API:
+    q (empresa ou título), published_after, published_before.
+    """
+    params = params or {}
+    condicoes = []
+    valores = []
+    if params.get("q"):
+        condicoes.append("(company LIKE ? OR title LIKE ?)")
+        valores += [f"%{params['q']}%"] * 2
+    if params.get("published_after"):
+        condicoes.append("published_at >= ?")
+        valores.append(params["published_after"])
+    if params.get("published_before"):
+        condicoes.append("published_at < ?")
+        valores.append(params["published_before"])
+
+    sql = "SELECT dados FROM jobs"
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+    sql += " ORDER BY published_at DESC"
+    if max_jobs is not None:
+        sql += f" LIMIT {int(max_jobs)}"
+
+    with _lock_armazem:
+        rows = _armazem_db().execute(sql, valores).fetchall()
+    for (dados,) in rows:
+        yield json.loads(dados)
+
+
+def obter_jobs(endpoint, params=None, max_jobs=None, workers=1, revalidar=False):
+    """
+    Fonte de anúncios dos comandos de análise: o armazém local se
+    USAR_ARMAZEM estiver ligado (--local), senão a API.
+    """
+    if USAR_ARMAZEM:
+        return iter_jobs_locais(params, max_jobs)
+    return iter_jobs(endpoint, params, max_jobs=max_jobs, workers=workers, revalidar=revalidar)
+
+
+# CONTAGEM DE SKILLS
+
+# Skills contadas pelo comando skills
+SKILLS_ITJOBS = [
+    "python", "java", "javascript", "c#", "c++", "sql", "html",
+    "css", "react", "node", "linux", "docker", "kubernetes",
+    "aws", "azure", "git", "django", "flask"
+]
+
+# Skills técnicas válidas para o list skills
+SKILLS_TEAMLYZER = {
+    # Linguagens de programação
+    "python", "java", "javascript", "typescript", "c++", "c#", "php", "ruby", 
+    "go", "golang", "rust", "swift", "kotlin", "scala", "r", "matlab",
+    
+    # Frameworks e bibliotecas
+    "react", "angular", "vue", "svelte", "django", "flask", "fastapi", 
+    "spring", "hibernate", "express", "node", "nodejs", "laravel", ".net",
+    "jquery", "bootstrap", "tailwind",
+    
+    # Bases de dados
+    "sql", "postgresql", "mysql", "mongodb", "redis", "cassandra", 
+    "elasticsearch", "oracle", "sqlite", "mariadb", "dynamodb",
+    
+    # DevOps e Cloud
+    "docker", "kubernetes", "aws", "azure", "gcp", "jenkins", "gitlab",
+    "terraform", "ansible", "ci/cd", "linux", "unix", "bash",
+    
+    # Controlo de versões
+    "git", "github", "bitbucket", "svn",
+    
+    # Web
+    "html", "css", "sass", "less", "webpack", "rest", "api", "graphql",
+    "soap", "microservices",
+    
+    # Data Science e AI
+    "machine learning", "ml", "deep learning", "ai", "tensorflow", 
+    "pytorch", "scikit-learn", "pandas", "numpy", "keras", "data science",
+    
+    # Metodologias
+    "agile", "scrum", "kanban", "devops",
+    
+    # Outras tecnologias
+    "spark", "hadoop", "kafka", "rabbitmq", "nginx", "apache"
+}
+
+
+class SkillMatcher:
+    """
+    Conta todas as skills de uma lista numa só passagem pelo texto, com uma
+    única regex (alternativas da mais longa para a mais curta).
+    Os limites não usam \\b, que falha em "c++", "c#" e ".net": uma skill só
+    conta se não estiver colada a letras/dígitos ou a + e #. Assim "java" não
+    conta dentro de "javascript" nem "git" dentro de "digital".
+    """
+
+    def __init__(self, skills):
+        alternativas = []
+        for skill in sorted({s.lower() for s in skills}, key=len, reverse=True):
+            padrao = r"\s+".join(re.escape(palavra) for palavra in skill.split())
+            # ".net" pode vir colado à esquerda (asp.net); as outras não
+            if re.match(r"\w", skill):
+                padrao = r"(?<![\w+#])" + padrao
+            alternativas.append(padrao)
+        self._regex = re.compile("(?:" + "|".join(alternativas) + r")(?![\w+#])")
+
+    @cronometrado("contar skills")
+    def contar(self, texto):
+        """
+        Devolve um Counter skill -> nº de ocorrências no texto.
+        """
+        contagem = Counter()
+        for match in self._regex.finditer(texto.lower()):
+            contagem[" ".join(match.group().split())] += 1
+        return contagem
+
+
+MATCHER_ITJOBS = SkillMatcher(SKILLS_ITJOBS)
+MATCHER_TEAMLYZER = SkillMatcher(SKILLS_TEAMLYZER)
+
 # ALÍNEA A) - Listar N trabalhos mais recentes
 
-def top(n, csv=None):
+def top(n, ficheiro_csv=None, formato="json", processos=0):
     """
     Lista os N trabalhos mais recentes publicados pela itjobs.pt.
-    Exemplo: 
+    Os anúncios são impressos (e exportados) à medida que chegam.
+    Exemplo:
       python emprego.py top 30
       python emprego.py top 30 resultado.csv
+      python emprego.py top 500 resultado.jsonl --format jsonl
     """
-    url = f"{URL}/job/list.json"
-    params = {"api_key": API_KEY, "limit": n}
-    
     try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-        
-        if response.status_code == 403:
-            print("ERRO: API bloqueada pelo Cloudflare. A tentar alternativa...")
-            response = requests.get(url, params=params, timeout=10)
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        if "error" in data:
-            print(f"Erro da API: {data['error']}")
-            sys.exit(1)
-        
-        jobs = data.get("results", [])
-        print(json.dumps(jobs, ensure_ascii=False, indent=2))
+        jobs = ecoar_jobs(iter_jobs("list", max_jobs=n), formato)
 
-        # Exportar para CSV se o nome do ficheiro foi indicado
-        if csv:
-            export_jobs_to_csv(jobs, csv)
-        
+        # Exportar se o nome do ficheiro foi indicado
+        if ficheiro_csv:
+            export_jobs(jobs, ficheiro_csv, processos=processos)
+        else:
+            _consumir(jobs)
+
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        sys.exit(1)
     except requests.RequestException as e:
         print(f"Erro ao conectar API: {e}")
         sys.exit(1)
     except json.JSONDecodeError:
-        print(f"Erro: Resposta invalida da API (Status: {response.status_code})")
+        print("Erro: Resposta invalida da API")
+        sys.exit(1)
+    except OSError:
+        # o export_jobs já explicou o erro; os anúncios foram impressos
         sys.exit(1)
 
 # ALÍNEA B) - Listar trabalhos part-time por empresa e localidade
 
-def search(localidade, empresa, n, csv=None):
-    """
-    Lista trabalhos part-time de uma empresa numa localidade.
-    Exemplo: 
-      python emprego.py search Porto "KCS IT" 3
-      python emprego.py search Porto "KCS IT" 3 resultados.csv
+def _na_localidade(job, localidade):
+    for loc in job.get("locations") or []:
+        if localidade.lower() in loc.get("name", "").lower():
+            return True
+    return False
+
+
+def _e_part_time(job):
+    for job_type in job.get("types") or []:
+        type_name = job_type.get("name", "").lower()
+        if "part" in type_name or "parcial" in type_name:
+            return True
+    return False
+
+
+def _filtrar_part_time(jobs, localidade):
     """
-    url = f"{URL}/job/search.json"
-    
-    params = {
-        "api_key": API_KEY,
-        "q": empresa,
-        "limit": 100
-    }
-    
-    try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-        
-        if response.status_code == 403:
-            print("ERRO: API bloqueada pelo Cloudflare. A tentar alternativa...")
-            response = requests.get(url, params=params, timeout=10)
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        if "error" in data:
-            print(f"Erro da API: {data['error']}")
-            sys.exit(1)
-        
-        jobs = data.get("results", [])
-        
-        # Filtra por localidade e part-time
-        filtered_jobs = []
-        for job in jobs:
-            # Localidade
-            location_match = False
-            if "locations" in job and job["locations"]:
-                for loc in job["locations"]:
-                    if localidade.lower() in loc.get("name", "").lower():
-                        location_match = True
-                        break
-            
-            # Se são part time
-            is_part_time = False
-            if "types" in job and job["types"]:
-                for job_type in job["types"]:
-                    type_name = job_type.get("name", "").lower()
-                    if "part" in type_name or "parcial" in type_name:
-                        is_part_time = True
-                        break
-           
-            if location_match and is_part_time:
-                filtered_jobs.append(job)
-                if len(filtered_jobs) >= n:
-                    break
-        
-        # resultados
-        if not filtered_jobs:
-            print("Nenhum trabalho part-time.")
+    Deixa passar só os anúncios part-time numa localidade.
+    """
+    for job in jobs:
+        if _na_localidade(job, localidade) and _e_part_time(job):
+            yield job
+
+
+def search(localidade, empresa, n, ficheiro_csv=None, formato="json", texto=None, processos=0):
+    """
+    Lista trabalhos part-time de uma empresa numa localidade.
+    Com --local responde pelos índices do armazém local, e aceita
+    --text para filtrar também por texto no título/descrição.
+    Exemplo: 
+      python emprego.py search Porto "KCS IT" 3
+      python emprego.py search Porto "KCS IT" 3 resultados.csv
+      python emprego.py search Porto "KCS IT" 20 --local --text python
+    """
+    try:
+        if USAR_ARMAZEM:
+            filtered_jobs = pesquisar_local(localidade, empresa, n, texto=texto)
+        else:
+            # Filtra por localidade e part-time, pedindo páginas só até ter N
+            filtered_jobs = islice(_filtrar_part_time(obter_jobs("search", {"q": empresa}), localidade), n)
+        jobs = ecoar_jobs(filtered_jobs, formato, vazio=None)
+
+        # Exportar se o nome do ficheiro foi indicado
+        if ficheiro_csv:
+            n_jobs = export_jobs(jobs, ficheiro_csv, processos=processos)
         else:
-            print(json.dumps(filtered_jobs[:n], ensure_ascii=False, indent=2))
+            n_jobs = _consumir(jobs)
 
-        # Exportar para CSV se o nome do ficheiro foi indicado
-        if csv and filtered_jobs:
-            export_jobs_to_csv(filtered_jobs[:n], csv)
+        # resultados
+        if not n_jobs:
+            print("Nenhum trabalho part-time.")
         
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        sys.exit(1)
     except requests.RequestException as e:
         print(f"Erro ao conectar a API: {e}")
         sys.exit(1)
     except json.JSONDecodeError:
-        print(f"Erro: Resposta invalida da API (Status: {response.status_code})")
+        print("Erro: Resposta invalida da API")
+        sys.exit(1)
+    except sqlite3.OperationalError as e:
+        print(f"Erro na pesquisa local: {e}")
+        sys.exit(1)
+    except OSError:
+        # o export_jobs já explicou o erro; os anúncios foram impressos
         sys.exit(1)
 
 # ALÍNEA C) - Extrair regime de trabalho de um job ID
 
+# Padrões do regime de trabalho, testados por esta ordem
+REGIMES = [
+    # remoto
+    ("remote", re.compile(r'\b(100%\s*remoto|full\s*remote|fully\s*remote|remote\s*work|trabalho\s*remoto)\b')),
+    # híbrido
+    ("hybrid", re.compile(r'\b(híbrido|hibrido|hybrid|regime\s*híbrido|modelo\s*híbrido|parcialmente\s*remoto)\b')),
+    # presencial
+    ("onsite", re.compile(r'\b(presencial|on-?site|escritório|escritorio|no\s*local)\b')),
+]
+
+
+def classificar_regime(job):
+    """
+    Devolve "remote", "hybrid", "onsite" ou "unknown" a partir do corpo e
+    do título do anúncio.
+    """
+    text_to_search = clean_html(job.get("body") or "").lower() + " " + (job.get("title") or "").lower()
+    for regime, padrao in REGIMES:
+        if padrao.search(text_to_search):
+            return regime
+    # se não encontrar nada
+    return "unknown"
+
+
 def type_job(job_id):
     """
     Extrai o regime de trabalho (remoto/hi­brido/presencial) de um job ID.
     Exemplo: python emprego.py type 506697
     """
-    url = f"{URL}/job/get.json"
-    
-    params = {
-        "api_key": API_KEY,
-        "id": job_id
-    }
-    
+    resolvedor = ResolvedorJobs()
+    resolvedor.preparar([job_id])
     try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-        
-        if response.status_code == 403:
-            print("ERRO: API bloqueada pelo Cloudflare. A tentar alternativa...")
-            response = requests.get(url, params=params, timeout=10)
-        
-        response.raise_for_status()
-        data = response.json()
-        
-        if "error" in data:
-            print(f"Erro da API: {data['error']}")
-            sys.exit(1)
-        
-        text_to_search = ""
-        if "body" in data:
-            text_to_search += data["body"].lower()
-        if "title" in data:
-            text_to_search += " " + data["title"].lower()
-        # remoto
-        if re.search(r'\b(100%\s*remoto|full\s*remote|fully\s*remote|remote\s*work|trabalho\s*remoto)\b', text_to_search):
-            print("remote")
-        # híbrido
-        elif re.search(r'\b(híbrido|hibrido|hybrid|regime\s*híbrido|modelo\s*híbrido|parcialmente\s*remoto)\b', text_to_search):
-            print("hybrid")
-        # presencial
-        elif re.search(r'\b(presencial|on-?site|escritório|escritorio|no\s*local)\b', text_to_search):
-            print("onsite")
-        # se não encontrar nada
-        else:
-            print("unknown")
-        
+        print(classificar_regime(resolvedor.obter(job_id)))
+
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        sys.exit(1)
     except requests.RequestException as e:
         print(f"Erro ao conectar a API: {e}")
         sys.exit(1)
     except json.JSONDecodeError:
-        print(f"Erro: Resposta inválida da API (Status: {response.status_code})")
+        print("Erro: Resposta inválida da API")
+        sys.exit(1)
+
+
+def type_jobs(job_ids=None, jobs=None, ficheiro=None, workers=8, varrer_listagem=False):
+    """
+    Versão em lote do type: escreve o mapeamento id -> regime em JSON Lines
+    (stdout ou ficheiro) ou CSV (ficheiro .csv).
+    Os jobs vêm de uma lista de IDs ou diretamente de um dump já guardado,
+    sem pedidos à API. Com uma lista de IDs, o detalhe sai do que já se
+    conhece (ver ResolvedorJobs) e só os restantes são pedidos (em
+    paralelo) a /job/get.json.
+    Exemplo:
+      python emprego.py type --ids-file ids.txt regimes.csv --workers 16
+      python emprego.py type --jobs-file jobs.jsonl
+      python emprego.py type --ids-file ids_recentes.txt --scan-list
+    """
+    resolvedor = ResolvedorJobs(varrer_listagem=varrer_listagem, workers=workers)
+
+    def classificar_id(job_id):
+        try:
+            return {"id": job_id, "regime": classificar_regime(resolvedor.obter(job_id))}
+        except (ApiError, requests.RequestException, json.JSONDecodeError) as e:
+            print(f"Erro ao obter job {job_id}: {e}", file=sys.stderr)
+            return None
+
+    if jobs is not None:
+        resultados = ({"id": job.get("id"), "regime": classificar_regime(job)} for job in jobs)
+    else:
+        ids = list(dict.fromkeys(job_ids))
+        resolvedor.preparar(ids)
+        resultados = map_concorrente(classificar_id, ids, workers)
+
+    try:
+        with abrir_saida(ficheiro, ["id", "regime"]) as escrever:
+            for resultado in resultados:
+                if resultado is not None:
+                    escrever(resultado)
+    except OSError as e:
+        print(f"Erro ao escrever o ficheiro '{ficheiro}': {e}")
         sys.exit(1)
 
 # ALÍNEA D) - Contar ocorrências de skills entre duas datas
 
-def skills(data_inicial, data_final):
+def _texto_skills(job):
+    """
+    Texto onde se contam as skills de um anúncio: título + descrição
+    (já sem HTML).
+    """
+    texto = ""
+    if "title" in job and job["title"]:
+        texto += job["title"].lower() + " "
+    if "body" in job and job["body"]:
+        texto += clean_html(job["body"]).lower()
+    return texto
+
+
+# Granularidades da série temporal do skills -> nº de caracteres da data
+PERIODOS = {"day": 10, "month": 7, "year": 4}
+
+
+def skills_locais(data_inicial=None, data_final=None, por=None):
+    """
+    Soma as contagens de skills já guardadas no armazém (tabela job_skills)
+    em vez de voltar a ler os anúncios.
+    Sem `por` devolve um Counter da janela; com `por` ("day", "month" ou
+    "year") devolve [(período, Counter), ...] por ordem cronológica.
+    """
+    condicoes = []
+    valores = []
+    if data_inicial:
+        condicoes.append("dia >= ?")
+        valores.append(data_inicial)
+    if data_final:
+        condicoes.append("dia < ?")
+        valores.append(data_final)
+    where = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+
+    with _lock_armazem:
+        db = _armazem_db()
+        if por is None:
+            rows = db.execute(f"SELECT skill, SUM(n) FROM job_skills{where} GROUP BY skill", valores).fetchall()
+            return Counter(dict(rows))
+
+        rows = db.execute(
+            f"SELECT substr(dia, 1, {PERIODOS[por]}) AS periodo, skill, SUM(n) FROM job_skills{where} "
+            "GROUP BY periodo, skill ORDER BY periodo", valores
+        ).fetchall()
+
+    serie = {}
+    for periodo, skill, n in rows:
+        serie.setdefault(periodo, Counter())[skill] = n
+    return list(serie.items())
+
+
+def _tem_skills_locais():
+    """
+    Se o armazém local já tem contagens de skills (houve pelo menos um sync).
+    """
+    if not os.path.exists(ARMAZEM_DB):
+        return False
+    with _lock_armazem:
+        return _armazem_db().execute("SELECT 1 FROM job_skills LIMIT 1").fetchone() is not None
+
+
+def skills(data_inicial, data_final, workers=1, por=None):
     """
     Conta ocorrÃªncias de skills nas descrições dos anuncios entre duas datas.
+    Com --local (ou --by) usa as contagens pré-calculadas do armazém local,
+    que tem de ter sido preenchido com sync;
+    --by day|month|year devolve logo a série temporal inteira.
     Exemplo:
       python emprego.py skills 2024-01-01 2024-02-01
+      python emprego.py skills 2024-01-01 2024-02-01 --workers 4
+      python emprego.py skills 2024-01-01 2025-01-01 --by month
     Saí­da: [{ "skill1": 2, "skill2": 1, ... }]
+    Saída com --by: [{ "periodo": "2024-01", "skills": { "skill1": 2, ... } }, ...]
     """
-    url = f"{URL}/job/search.json"
-
     params = {
-        "api_key": API_KEY,
-        "limit": 200,               #numero max de anuncios a analisar
         "published_after": data_inicial,
         "published_before": data_final,
     }
 
-    # Lista de skills a analisar 
-    lista_skills = [
-        "python", "java", "javascript", "c#", "c++", "sql", "html",
-        "css", "react", "node", "linux", "docker", "kubernetes",
-        "aws", "azure", "git", "django", "flask"
-    ]
+    if (por or USAR_ARMAZEM) and not _tem_skills_locais():
+        print("Erro: o armazém local está vazio; corra primeiro 'python emprego.py sync'.")
+        sys.exit(1)
 
     try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        jobs = data.get("results", [])
-
-        contagem = Counter()
+        if por:
+            resultado = [
+                {"periodo": periodo, "skills": dict(contagem.most_common())}
+                for periodo, contagem in skills_locais(data_inicial, data_final, por)
+            ]
+            print(json.dumps(resultado, ensure_ascii=False, indent=2))
+            return
 
-        # Percorrer anÃºncios e contar skills
-        for job in jobs:
-            texto = ""
-            if "title" in job and job["title"]:
-                texto += job["title"].lower() + " "
-            if "body" in job and job["body"]:
-                texto += job["body"].lower()
+        if USAR_ARMAZEM:
+            contagem = skills_locais(data_inicial, data_final)
+        else:
+            contagem = Counter()
 
-            for skill in lista_skills:
-                ocorrencias = texto.count(skill.lower())
-                if ocorrencias > 0:
-                    contagem[skill] += ocorrencias
+            # Percorrer todos os anúncios da janela (todas as páginas) e contar skills
+            for job in obter_jobs("search", params, workers=workers):
+                contagem.update(MATCHER_ITJOBS.contar(_texto_skills(job)))
 
         # Ordenar por num de ocorrencias (decrescente)
         ordenado = contagem.most_common()
@@ -248,65 +1759,198 @@ def skills(data_inicial, data_final):
 
         print(json.dumps(resultado, ensure_ascii=False, indent=2))
 
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        sys.exit(1)
     except requests.RequestException as e:
         print(f"Erro ao conectar a  API: {e}")
         sys.exit(1)
     except json.JSONDecodeError:
-        print(f"Erro: Resposta invalida da API (Status: {response.status_code})")
+        print("Erro: Resposta invalida da API")
         sys.exit(1)
 
 # Alinea E): exportar lista de jobs para CSV
 
+# Elementos que separam blocos de texto: dão origem a uma quebra de linha
+BLOCOS_HTML = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+})
+# Elementos cujo conteúdo não é texto visível
+IGNORAR_HTML = frozenset({"script", "style", "head", "template", "noscript"})
+
+
+# Conversão em três passes de expressões regulares sem retrocesso
+# quadrático: um padrão que pode ficar por fechar (comentário, script)
+# consome até ao fecho ou até ao fim do documento, e uma tag (atributos
+# entre aspas podem conter ">") nunca é procurada para lá do "<" seguinte.
+# Assim cada "<" custa, no máximo, o texto até ao próximo "<" e um "<" que
+# não inicie uma tag fica como texto.
+_ATRIBUTOS_HTML = r'(?:[^<>"\']|"[^"<]*"|\'[^\'<]*\')*>'
+IGNORADO_HTML = re.compile(
+    r'<!--.*?(?:-->|\Z)'
+    rf'|<({"|".join(sorted(IGNORAR_HTML))})\b{_ATRIBUTOS_HTML}.*?(?:</\1\s*>|\Z)',
+    re.S | re.I,
+)
+BLOCO_HTML = re.compile(rf'</?(?:{"|".join(sorted(BLOCOS_HTML))})\b{_ATRIBUTOS_HTML}', re.I)
+TAG_HTML = re.compile(rf'</?[a-zA-Z][a-zA-Z0-9]*{_ATRIBUTOS_HTML}|<[!?][^<>]*>')
+
+
+@cronometrado("clean_html")
 def clean_html(raw_html):
     """
-    Remove tags HTML de um texto.
+    Converte HTML em texto simples em tempo linear no tamanho do documento:
+    descodifica entidades, ignora comentários e o conteúdo de script/style
+    e põe uma quebra de linha nas fronteiras de blocos para as palavras
+    não se colarem. Espaços (incluindo &nbsp;) ficam colapsados em cada
+    linha e as linhas vazias são removidas.
+    """
+    if not raw_html:
+        return ""
+    texto = IGNORADO_HTML.sub("", raw_html)
+    texto = BLOCO_HTML.sub("\n", texto)
+    texto = TAG_HTML.sub("", texto)
+
+    # as entidades não atravessam tags, por isso descodifica-se tudo no fim
+    texto = html.unescape(texto)
+    linhas = (" ".join(linha.split()) for linha in texto.split("\n"))
+    return "\n".join(linha for linha in linhas if linha)
+
+
+# Campos exportados por top/search
+EXPORT_FIELDNAMES = [
+    "titulo",
+    "empresa",
+    "descricao",
+    "data_publicacao",
+    "salario",
+    "localizacao",
+]
+
+
+def _linha_export(job):
     """
-    clean = re.compile('<.*?>')
-    return re.sub(clean, '', raw_html).strip()
+    Linha do CSV de top/search.
+    """
+    titulo = job.get("title", "") or "Sem título"
+    empresa = job.get("company", {}).get("name", "") or "Não especificado"
+    descricao_raw = job.get("body", "") or ""
+    descricao = clean_html(descricao_raw) or "Sem descrição"
+    data_pub = job.get("publishedAt", "") or "Desconhecida"
+    salario = job.get("wage", "") or "Não especificado"
+
+    locs = job.get("locations", []) or []
+    localizacao = ", ".join(loc.get("name", "") for loc in locs) or "Não especificado"
+
+    return {
+        "titulo": titulo,
+        "empresa": empresa,
+        "descricao": descricao,
+        "data_publicacao": data_pub,
+        "salario": salario,
+        "localizacao": localizacao,
+    }
+
 
-def export_jobs_to_csv(jobs, csv):
+def export_jobs_to_csv(jobs, ficheiro_csv, flush_every=FLUSH_A_CADA, processos=0):
     """
-    Exporta uma lista de anúncios para CSV com os campos:
+    Exporta anúncios para CSV com os campos:
     titulo; empresa; descricao; data_publicacao; salario; localizacao
+    Aceita qualquer iterável (lista ou gerador): cada linha é escrita assim
+    que o anúncio chega. Com processos > 0 a limpeza do HTML das descrições
+    é feita em paralelo nesse nº de processos (mantendo a ordem).
+    Devolve o nº de linhas escritas. Se o ficheiro não puder ser escrito,
+    percorre mesmo assim o resto dos anúncios (p.ex. para o eco no stdout
+    ficar completo) e volta a lançar o OSError.
     """
-    fieldnames = [
-        "titulo",
-        "empresa",
-        "descricao",
-        "data_publicacao",
-        "salario",
-        "localizacao",
-    ]
-
+    n = 0
     try:
-        with open(csv, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
+        with abrir_saida(ficheiro_csv, EXPORT_FIELDNAMES, "csv", flush_every) as escrever:
+            for linha in map_processos(_linha_export, jobs, processos):
+                escrever(linha)
+                n += 1
+
+        print(f"CSV criado com sucesso: {ficheiro_csv}")
+
+    except requests.RequestException:
+        # requests.ConnectionError também é um OSError, mas não é do ficheiro
+        raise
+    except OSError as e:
+        print(f"Erro ao escrever o ficheiro CSV '{ficheiro_csv}': {e}", file=sys.stderr)
+        _consumir(jobs)
+        raise
+    return n
 
+
+def export_jobs_to_jsonl(jobs, ficheiro, flush_every=FLUSH_A_CADA):
+    """
+    Exporta anúncios completos em JSON Lines (um anúncio por linha),
+    à medida que chegam. Devolve o nº de linhas escritas; se o ficheiro não
+    puder ser escrito, faz como o export_jobs_to_csv.
+    """
+    n = 0
+    try:
+        with abrir_saida(ficheiro, None, "jsonl", flush_every) as escrever:
             for job in jobs:
-                titulo = job.get("title", "") or "Sem título"
-                empresa = job.get("company", {}).get("name", "") or "Não especificado"
-                descricao_raw = job.get("body", "") or ""
-                descricao = clean_html(descricao_raw) or "Sem descrição"
-                data_pub = job.get("publishedAt", "") or "Desconhecida"
-                salario = job.get("wage", "") or "Não especificado"
-
-                locs = job.get("locations", []) or []
-                localizacao = ", ".join(loc.get("name", "") for loc in locs) or "Não especificado"
-
-                writer.writerow({
-                    "titulo": titulo,
-                    "empresa": empresa,
-                    "descricao": descricao,
-                    "data_publicacao": data_pub,
-                    "salario": salario,
-                    "localizacao": localizacao,
-                })
-
-        print(f"CSV criado com sucesso: {csv}")
+                escrever(job)
+                n += 1
 
+        print(f"JSONL criado com sucesso: {ficheiro}")
+
+    except requests.RequestException:
+        raise
     except OSError as e:
-        print(f"Erro ao escrever o ficheiro CSV '{csv}': {e}")
+        print(f"Erro ao escrever o ficheiro JSONL '{ficheiro}': {e}", file=sys.stderr)
+        _consumir(jobs)
+        raise
+    return n
+
+
+def export_jobs(jobs, ficheiro, flush_every=FLUSH_A_CADA, processos=0):
+    """
+    Exporta para JSON Lines se o ficheiro terminar em .jsonl/.ndjson,
+    caso contrário para CSV.
+    """
+    if ficheiro.lower().endswith((".jsonl", ".ndjson")):
+        return export_jobs_to_jsonl(jobs, ficheiro, flush_every)
+    return export_jobs_to_csv(jobs, ficheiro, flush_every, processos)
+
+
+def ecoar_jobs(jobs, formato="json", vazio="[]"):
+    """
+    Imprime cada anúncio no stdout assim que chega e volta a devolvê-lo,
+    para poder ser exportado ao mesmo tempo.
+    formato "json": o mesmo array indentado de sempre, escrito aos poucos;
+    formato "jsonl": um anúncio por linha.
+    `vazio` é o que se imprime se não houver anúncios (None para nada).
+    """
+    out = sys.stdout
+    n = 0
+    for job in jobs:
+        if formato == "jsonl":
+            out.write(json.dumps(job, ensure_ascii=False) + "\n")
+        else:
+            texto = json.dumps(job, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            out.write(("[\n  " if n == 0 else ",\n  ") + texto)
+        out.flush()
+        n += 1
+        yield job
+
+    if formato != "jsonl" and (n or vazio is not None):
+        out.write("\n]\n" if n else vazio + "\n")
+        out.flush()
+
+
+def _consumir(jobs):
+    """
+    Percorre o iterável até ao fim e devolve quantos elementos tinha.
+    """
+    n = 0
+    for _ in jobs:
+        n += 1
+    return n
 
 
 
@@ -318,53 +1962,255 @@ def export_jobs_to_csv(jobs, csv):
 
 # ALÍNEA A) - Informações acerca da empresa que publicita o trabalho
 
-def find_teamlyzer_company_url(company_name):
+# Índice nome -> URL das empresas do ranking, construído uma vez e guardado
+# na base de dados local; só volta a ser descarregado ao fim de
+# INDICE_EMPRESAS_TTL segundos.
+INDICE_EMPRESAS_TTL = 7 * 24 * 3600
+
+_indice_empresas = None
+_lock_indice = threading.Lock()
+
+
+def _normalizar_empresa(nome):
     """
-    Procura a empresa no ranking do Teamlyzer e devolve o URL da página dela.
+    Minúsculas, sem pontuação e com espaços colapsados.
+    """
+    return " ".join(re.sub(r'[^\w\s]', '', nome.lower()).split())
+
+
+def _construir_indice(entradas):
+    """
+    entradas: lista de (chave, href) pela ordem do ranking.
+    Devolve o índice exato, o índice por palavra e a lista ordenada.
+    """
+    exato = {}
+    por_palavra = {}
+    for posicao, (chave, href) in enumerate(entradas):
+        exato.setdefault(chave, href)
+        for palavra in set(chave.split()):
+            por_palavra.setdefault(palavra, []).append(posicao)
+    return {"exato": exato, "por_palavra": por_palavra, "entradas": entradas, "resolvidos": {}}
+
+
+# Declaração XML no início de uma página (o lxml recusa-a em texto já descodificado)
+RE_DECLARACAO_XML = re.compile(r'^\s*<\?xml[^>]*>')
+
+
+def _documento_html(texto):
+    """
+    Árvore lxml de uma página HTML em texto. Tolera o que o BeautifulSoup
+    tolera: uma declaração <?xml ... encoding=...?> no início e páginas sem
+    nenhum elemento (vazias ou só com um comentário).
+    """
+    texto = RE_DECLARACAO_XML.sub("", texto or "", count=1)
+    try:
+        return lxml.html.document_fromstring(texto)
+    except lxml.etree.ParserError:
+        return lxml.html.document_fromstring(f"<html><body>{texto}</body></html>")
+
+
+def _descarregar_ranking():
+    """
+    Lê o ranking do Teamlyzer e devolve [(chave, href), ...] pela ordem da página.
     """
     ranking_url = TEAMLYZER_BASE + "/companies/ranking"
+    response = http_get(ranking_url, headers=TEAMLYZER_HEADERS)
+    response.raise_for_status()
+
+    doc = _documento_html(response.text)
 
+    entradas = []
+    for link in doc.xpath("//a[@href]"):
+        href = link.get("href")
+        if "/companies/" in href and href != "/companies/ranking":
+            chave = _normalizar_empresa("".join(t.strip() for t in link.xpath(".//text()")))
+            if chave:
+                entradas.append((chave, href))
+    return entradas
+
+
+def carregar_indice_empresas(refresh=False):
+    """
+    Devolve o índice de empresas do Teamlyzer (em memória -> disco -> rede).
+    Com a cache desligada (--no-cache) o disco não é lido nem escrito.
+    """
+    global _indice_empresas
+
+    with _lock_indice:
+        if _indice_empresas is not None and not refresh:
+            return _indice_empresas
+
+        entradas = None
+        if CACHE_ATIVA and not refresh and not CACHE_REFRESH:
+            with _lock_cache:
+                db = _cache_db()
+                row = db.execute("SELECT valor FROM meta WHERE nome = 'teamlyzer_empresas'").fetchone()
+                atualizado_em = float(row[0]) if row else 0.0
+                if time.time() - atualizado_em < INDICE_EMPRESAS_TTL:
+                    entradas = db.execute("SELECT chave, href FROM teamlyzer_empresas ORDER BY posicao").fetchall()
+
+        if not entradas:
+            entradas = _descarregar_ranking()
+            if CACHE_ATIVA:
+                with _lock_cache:
+                    db = _cache_db()
+                    db.execute("DELETE FROM teamlyzer_empresas")
+                    db.executemany("INSERT INTO teamlyzer_empresas VALUES (?, ?, ?)",
+                                   [(i, chave, href) for i, (chave, href) in enumerate(entradas)])
+                    db.execute("INSERT OR REPLACE INTO meta VALUES ('teamlyzer_empresas', ?)", (str(time.time()),))
+                    db.commit()
+
+        _indice_empresas = _construir_indice(entradas)
+        return _indice_empresas
+
+
+def find_teamlyzer_company_url(company_name):
+    """
+    Procura a empresa no ranking do Teamlyzer e devolve o URL da página dela.
+    Usa o índice de empresas: primeiro procura o nome exato (O(1)); se não
+    existir, procura por substring só entre as empresas que partilham
+    alguma palavra com o nome e, em último caso, em todas.
+    """
     try:
-        response = requests.get(ranking_url, headers=TEAMLYZER_HEADERS, timeout=10)
-        response.raise_for_status()
+        indice = carregar_indice_empresas()
     except Exception as e:
-        print(f"Erro ao aceder ao Teamlyzer: {e}")
+        print(f"Erro ao aceder ao Teamlyzer: {e}", file=sys.stderr)
         return None
 
-    soup = BeautifulSoup(response.text, "lxml")
-    
     # Normalizar nome da empresa
-    company_clean = re.sub(r'[^\w\s]', '', company_name.lower().strip())
+    company_clean = _normalizar_empresa(company_name)
+    if not company_clean:
+        return None
+
+    resolvidos = indice["resolvidos"]
+    if company_clean not in resolvidos:
+        href = indice["exato"].get(company_clean)
+
+        if href is None:
+            entradas = indice["entradas"]
+            candidatas = sorted({
+                posicao
+                for palavra in company_clean.split()
+                for posicao in indice["por_palavra"].get(palavra, ())
+            })
+            for posicao in candidatas + list(range(len(entradas))):
+                texto, href_candidato = entradas[posicao]
+                if company_clean in texto or texto in company_clean:
+                    href = href_candidato
+                    break
 
-    for link in soup.find_all("a", href=True):
-        if "/companies/" in link["href"] and link["href"] != "/companies/ranking":
-            texto = re.sub(r'[^\w\s]', '', link.get_text(strip=True).lower())
-            
-            
-            if company_clean in texto or texto in company_clean:
-                return TEAMLYZER_BASE + link["href"]
+        resolvidos[company_clean] = href
 
-    return None
+    href = resolvidos[company_clean]
+    return TEAMLYZER_BASE + href if href else None
+
+
+TEAMLYZER_VAZIO = {
+    "teamlyzer_rating": None,
+    "teamlyzer_description": None,
+    "teamlyzer_benefits": None,
+    "teamlyzer_salary": None
+}
 
 
 def scrape_teamlyzer_info(url):
     """
     Extrai rating, descrição, benefícios e salário médio da página da empresa.
-    NOTA: Os seletores são genéricos - deve adaptar ao HTML real do site!
+    Mantida por compatibilidade: é o mesmo que obter_perfil_teamlyzer
+    (passa pela store de perfis).
     """
-    try:
-        response = requests.get(url, headers=TEAMLYZER_HEADERS, timeout=10)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"Erro ao fazer scraping: {e}")
-        return {
-            "teamlyzer_rating": None,
-            "teamlyzer_description": None,
-            "teamlyzer_benefits": None,
-            "teamlyzer_salary": None
-        }
+    return obter_perfil_teamlyzer(url)
+
+
+# Parser usado para as páginas do Teamlyzer:
+#   "lxml" - extrator direto sobre a árvore lxml (rápido, por omissão)
+#   "bs4"  - implementação original com BeautifulSoup
+TEAMLYZER_PARSER = "lxml"
+
+RE_RATING = re.compile(r'(\d+)[.,](\d+)')
+RE_SALARIO = re.compile(r'(salário|salary|€|\$)', re.IGNORECASE)
+
+
+@cronometrado("parse teamlyzer")
+def parse_teamlyzer_page(html, parser=None):
+    """
+    Extrai os campos teamlyzer_* do HTML da página de uma empresa.
+    """
+    # sem a declaração XML: o bs4 leria o "1.0" da versão como rating
+    html = RE_DECLARACAO_XML.sub("", html or "", count=1)
+    if (parser or TEAMLYZER_PARSER) == "bs4":
+        return _parse_teamlyzer_bs4(html)
+    return _parse_teamlyzer_lxml(html)
+
 
-    soup = BeautifulSoup(response.text, "lxml")
+def _texto_elemento(el):
+    """
+    Equivalente a get_text(" ", strip=True) do BeautifulSoup para um elemento lxml.
+    """
+    return " ".join(t.strip() for t in el.xpath(".//text()") if t.strip())
+
+
+def _parse_teamlyzer_lxml(html):
+    """
+    Mesmo resultado que _parse_teamlyzer_bs4, mas percorre diretamente a
+    árvore lxml (sem construir a árvore do BeautifulSoup) e faz uma só
+    passagem pelos nós de texto para o rating e o salário.
+    """
+    if not html or not html.strip():
+        return dict(TEAMLYZER_VAZIO)
+    doc = _documento_html(html)
+
+    # RATING e SALÁRIO: nós de texto (e comentários, como no find_all do bs4)
+    rating = None
+    salary = None
+    rating_ok = False
+    for node in doc.xpath("//text() | //comment()"):
+        texto = node if isinstance(node, str) else (node.text or "")
+
+        if not rating_ok:
+            match = RE_RATING.search(texto)
+            if match:
+                rating = float(f"{match.group(1)}.{match.group(2)}")
+                rating_ok = 0 <= rating <= 5
+
+        if salary is None and RE_SALARIO.search(texto):
+            if len(texto.strip()) < 200:
+                salary = texto.strip()
+
+        if rating_ok and salary is not None:
+            break
+
+    # DESCRIÇÃO
+    desc = None
+    meta_desc = doc.xpath('//meta[@name="description"]')
+    if meta_desc and meta_desc[0].get("content"):
+        desc = meta_desc[0].get("content")
+    else:
+        first_p = doc.find(".//p")
+        if first_p is not None:
+            desc = _texto_elemento(first_p)
+
+    # BENEFÍCIOS
+    benefits = None
+    for ul in doc.iter("ul"):
+        items = [_texto_elemento(li) for li in ul.iter("li")]
+        if len(items) > 2:
+            benefits = "; ".join(items[:5])  # Primeiros 5
+            break
+
+    return {
+        "teamlyzer_rating": rating,
+        "teamlyzer_description": desc,
+        "teamlyzer_benefits": benefits,
+        "teamlyzer_salary": salary
+    }
+
+
+def _parse_teamlyzer_bs4(html):
+    """
+    Implementação original com BeautifulSoup (referência para o benchmark).
+    """
+    soup = bs4.BeautifulSoup(html, "lxml")
 
     # RATING 
     rating = None
@@ -396,41 +2242,283 @@ def scrape_teamlyzer_info(url):
             benefits = "; ".join(items[:5])  # Primeiros 5
             break
 
-    # SALÁRIO 
-    salary = None
-    for tag in soup.find_all(text=re.compile(r'(salário|salary|€|\$)', re.IGNORECASE)):
-        text = tag.strip()
-        if len(text) < 200:  
-            salary = text
-            break
+    # SALÁRIO 
+    salary = None
+    for tag in soup.find_all(text=re.compile(r'(salário|salary|€|\$)', re.IGNORECASE)):
+        text = tag.strip()
+        if len(text) < 200:  
+            salary = text
+            break
+
+    return {
+        "teamlyzer_rating": rating,
+        "teamlyzer_description": desc,
+        "teamlyzer_benefits": benefits,
+        "teamlyzer_salary": salary
+    }
+
+
+# Campos "relevantes" exportados pelo comando get
+GET_FIELDNAMES = [
+    "job_id",
+    "titulo",
+    "empresa",
+    "localizacao",
+    "data_publicacao",
+    "teamlyzer_rating",
+    "teamlyzer_salary",
+    "teamlyzer_benefits",
+    "teamlyzer_description",
+]
+
+
+# Perfis das empresas já extraídos, guardados por URL. Um perfil com menos
+# de PERFIS_TTL segundos é usado sem voltar a fazer scraping.
+PERFIS_TTL = 3 * 24 * 3600
+
+
+def _perfil_guardado(url):
+    with _lock_cache:
+        row = _cache_db().execute(
+            "SELECT dados, obtido_em FROM teamlyzer_perfis WHERE url = ?", (url,)
+        ).fetchone()
+    if row is None or time.time() - row[1] >= PERFIS_TTL:
+        return None
+    return json.loads(row[0])
+
+
+def _guardar_perfil(url, perfil):
+    with _lock_cache:
+        db = _cache_db()
+        db.execute("INSERT OR REPLACE INTO teamlyzer_perfis VALUES (?, ?, ?)",
+                   (url, json.dumps(perfil, ensure_ascii=False), time.time()))
+        db.commit()
+
+
+def obter_perfil_teamlyzer(url, pool_parse=None):
+    """
+    Devolve o perfil (campos teamlyzer_*) da empresa em `url`.
+    Lê primeiro da store local de perfis; só faz scraping se o perfil não
+    existir ou estiver desatualizado, e guarda o resultado.
+    Com `pool_parse` (um ProcessPoolExecutor) o parsing corre nesse pool.
+    """
+    usar_store = CACHE_ATIVA and not CACHE_REFRESH
+    perfil = _perfil_guardado(url) if usar_store else None
+    if perfil is not None:
+        return perfil
+
+    try:
+        response = http_get(url, headers=TEAMLYZER_HEADERS)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Erro ao fazer scraping: {e}", file=sys.stderr)
+        return dict(TEAMLYZER_VAZIO)
+
+    if pool_parse is not None:
+        perfil = pool_parse.submit(parse_teamlyzer_page, response.text).result()
+    else:
+        perfil = parse_teamlyzer_page(response.text)
+    if CACHE_ATIVA:
+        _guardar_perfil(url, perfil)
+    return perfil
+
+
+def fetch_job(job_id):
+    """
+    Obtém um anúncio de /job/get.json. Lança ApiError se a API devolver erro.
+    """
+    url = f"{URL}/job/get.json"
+    params = {"api_key": API_KEY, "id": job_id}
+
+    response = http_get(url, params=params, headers=HEADERS)
+    response.raise_for_status()
+    job = response.json()
+
+    if "error" in job:
+        raise ApiError(job["error"])
+    return job
+
+
+# DETALHE DE JOBS EM LOTE
+#
+# As respostas de /job/list.json e /job/search.json já trazem, em geral, o
+# detalhe de cada anúncio. Para resolver muitos IDs, o detalhe vem primeiro
+# do que já se conhece (anúncios listados nesta execução, exceto com
+# --no-cache/--refresh, e o armazém com --local) e só o que faltar vai a
+# /job/get.json, um pedido por ID. Com --scan-list, antes disso lêem-se em paralelo algumas páginas da
+# listagem (100 anúncios por pedido): compensa quando os IDs são recentes.
+
+# Campos de que os comandos precisam; um anúncio sem algum deles é
+# completado com /job/get.json
+CAMPOS_DETALHE = ("title", "body", "company", "locations", "publishedAt")
+# Máximo de páginas da listagem lidas com --scan-list
+LISTAGEM_MAX_PAGINAS = 10
+
+
+def _tem_detalhe(job):
+    return all(campo in job for campo in CAMPOS_DETALHE)
+
+
+def _jobs_do_armazem(job_ids, lote=500):
+    """
+    Anúncios do armazém local com os IDs dados (os que lá estiverem).
+    Só com --local: sem ele não se sabe quão antiga é a cópia do armazém.
+    """
+    if not USAR_ARMAZEM:
+        return
+    ids = [int(job_id) for job_id in job_ids if str(job_id).isdigit()]
+    for i in range(0, len(ids), lote):
+        parte = ids[i:i + lote]
+        sql = f"SELECT dados FROM jobs WHERE id IN ({', '.join('?' * len(parte))})"
+        with _lock_armazem:
+            rows = _armazem_db().execute(sql, parte).fetchall()
+        for (dados,) in rows:
+            yield json.loads(dados)
+
+
+class ResolvedorJobs:
+    """
+    Resolve o detalhe de vários jobs poupando pedidos a /job/get.json.
+    preparar(ids) junta de uma vez o detalhe que se consegue obter em bloco;
+    obter(id) devolve-o, ou pede /job/get.json se faltar (pedidos
+    simultâneos para o mesmo ID fazem um só pedido).
+    Exemplo:
+      resolvedor = ResolvedorJobs(jobs=anuncios_ja_listados)
+      resolvedor.preparar(ids)
+      for job in map_concorrente(resolvedor.obter, ids, 8): ...
+    """
+
+    def __init__(self, jobs=None, varrer_listagem=False, workers=4):
+        self.varrer_listagem = varrer_listagem
+        self.workers = workers
+        self._jobs = {}     # id (str) -> (anúncio, origem)
+        self._lock = threading.Lock()
+        self._pedidos = PedidosPartilhados()
+        if jobs is not None:
+            self.juntar(jobs)
+
+    def juntar(self, jobs, origem="conhecido"):
+        """
+        Regista anúncios já obtidos (p.ex. de uma listagem ou pesquisa).
+        Um anúncio completo nunca é substituído por um incompleto.
+        """
+        with self._lock:
+            for job in jobs:
+                if job.get("id") is None:
+                    continue
+                chave = str(job["id"])
+                atual = self._jobs.get(chave)
+                if atual is None or not _tem_detalhe(atual[0]):
+                    self._jobs[chave] = (job, origem)
+
+    def _conhecido(self, job_id):
+        with self._lock:
+            atual = self._jobs.get(str(job_id))
+        if atual is not None and _tem_detalhe(atual[0]):
+            return atual
+        visto = _job_visto(job_id) if CACHE_ATIVA and not CACHE_REFRESH else None
+        if visto is not None and _tem_detalhe(visto):
+            return visto, "listagem"
+        return None
+
+    def preparar(self, job_ids):
+        """
+        Junta em bloco o detalhe de `job_ids`: do armazém (com --local) e,
+        com varrer_listagem, de algumas páginas da listagem. Devolve os IDs
+        ainda em falta.
+        """
+        faltam = {str(job_id) for job_id in job_ids if self._conhecido(job_id) is None}
+        if faltam:
+            self.juntar(_jobs_do_armazem(faltam), "armazém")
+            faltam = {job_id for job_id in faltam if self._conhecido(job_id) is None}
+        if faltam and self.varrer_listagem and not USAR_ARMAZEM:
+            # nunca mais páginas do que IDs em falta (cada uma custa um pedido)
+            paginas = min(LISTAGEM_MAX_PAGINAS, len(faltam))
+            try:
+                for job in iter_jobs("list", max_jobs=paginas * TAMANHO_PAGINA, workers=self.workers):
+                    if str(job.get("id")) in faltam and _tem_detalhe(job):
+                        self.juntar([job], "listagem")
+                        faltam.discard(str(job["id"]))
+                        if not faltam:
+                            break
+            except (ApiError, requests.RequestException, json.JSONDecodeError) as e:
+                # a varredura é só uma otimização: os que faltarem vão a /job/get.json
+                print(f"Aviso: não foi possível ler a listagem ({e}); os anúncios são pedidos um a um.",
+                      file=sys.stderr)
+        return faltam
+
+    def _pedir(self, job_id):
+        job = fetch_job(job_id)
+        self.juntar([job], "get")
+        return job
+
+    def obter(self, job_id):
+        """
+        Detalhe de um job (uma cópia, que se pode alterar à vontade).
+        Lança ApiError / requests.RequestException como o fetch_job.
+        """
+        conhecido = self._conhecido(job_id)
+        if conhecido is not None:
+            job, origem = conhecido
+        else:
+            job, origem = self._pedidos.obter(str(job_id), self._pedir, job_id), "get"
+        if PERFIL_ATIVO:
+            METRICAS.detalhe_job(origem)
+        return dict(job)
+
+
+def enrich_job(job, scrape=None):
+    """
+    Acrescenta ao job os campos teamlyzer_* da empresa que o publicou.
+    `scrape` (por omissão obter_perfil_teamlyzer) recebe o URL da empresa.
+    Devolve o URL da empresa no Teamlyzer (None se não foi encontrada).
+    """
+    scrape = scrape or obter_perfil_teamlyzer
+    company = (job.get("company") or {}).get("name")
+    url_empresa = find_teamlyzer_company_url(company) if company else None
+
+    if url_empresa:
+        job.update(scrape(url_empresa))
+    else:
+        job.update(TEAMLYZER_VAZIO)
+    return url_empresa
+
+
+def _linha_get(job):
+    """
+    Linha do CSV do comando get.
+    """
+    # Localizações num só campo
+    locs = job.get("locations", []) or []
+    localizacao = ", ".join(loc.get("name", "") for loc in locs) or "Não especificado"
 
     return {
-        "teamlyzer_rating": rating,
-        "teamlyzer_description": desc,
-        "teamlyzer_benefits": benefits,
-        "teamlyzer_salary": salary
+        "job_id": job.get("id"),
+        "titulo": job.get("title"),
+        "empresa": (job.get("company") or {}).get("name"),
+        "localizacao": localizacao,
+        "data_publicacao": job.get("publishedAt"),
+        "teamlyzer_rating": job.get("teamlyzer_rating"),
+        "teamlyzer_salary": job.get("teamlyzer_salary"),
+        "teamlyzer_benefits": job.get("teamlyzer_benefits"),
+        "teamlyzer_description": job.get("teamlyzer_description"),
     }
 
 
-def get_job(job_id, csv=None):
+def get_job(job_id, ficheiro_csv=None):
     """
     Alínea (a) – Junta dados do itjobs + scraping Teamlyzer.
     Exemplo:
       python emprego.py get 506697
       python emprego.py get 506697 output.csv   # exporta para CSV
     """
-    url = f"{URL}/job/get.json"
-    params = {"api_key": API_KEY, "id": job_id}
-
+    resolvedor = ResolvedorJobs()
+    resolvedor.preparar([job_id])
     try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        job = response.json()
-        
-        if "error" in job:
-            print(f"Erro da API: {job['error']}")
-            return
-            
+        job = resolvedor.obter(job_id)
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        return
     except requests.RequestException as e:
         print(f"Erro ao obter job da API: {e}")
         return
@@ -445,141 +2533,336 @@ def get_job(job_id, csv=None):
         print(json.dumps(job, indent=2, ensure_ascii=False))
         return
 
-    # URL da empresa no Teamlyzer
-    url_empresa = find_teamlyzer_company_url(company)
-
-    if not url_empresa:
+    # URL da empresa no Teamlyzer + informação da empresa
+    if not enrich_job(job):
         print(f"Empresa '{company}' não encontrada no Teamlyzer.")
-        job.update({
-            "teamlyzer_rating": None,
-            "teamlyzer_description": None,
-            "teamlyzer_benefits": None,
-            "teamlyzer_salary": None
-        })
-    else:
-        # Extrair informação da empresa
-        extra = scrape_teamlyzer_info(url_empresa)
-        job.update(extra)
 
     # Imprimir JSON no ecrã
     print(json.dumps(job, indent=2, ensure_ascii=False))
 
     # Exportar para CSV se o utilizador passou um caminho
-    if csv:
-        # Campos "relevantes" que vou exportar
-        fieldnames = [
-            "job_id",
-            "titulo",
-            "empresa",
-            "localizacao",
-            "data_publicacao",
-            "teamlyzer_rating",
-            "teamlyzer_salary",
-            "teamlyzer_benefits",
-            "teamlyzer_description",
-        ]
-
-        # Localizações num só campo
-        locs = job.get("locations", []) or []
-        localizacao = ", ".join(loc.get("name", "") for loc in locs) or "Não especificado"
-
+    if ficheiro_csv:
         try:
-            with open(csv, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
+            with open(ficheiro_csv, "w", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=GET_FIELDNAMES)
                 writer.writeheader()
-                writer.writerow({
-                    "job_id": job.get("id"),
-                    "titulo": job.get("title"),
-                    "empresa": company,
-                    "localizacao": localizacao,
-                    "data_publicacao": job.get("publishedAt"),
-                    "teamlyzer_rating": job.get("teamlyzer_rating"),
-                    "teamlyzer_salary": job.get("teamlyzer_salary"),
-                    "teamlyzer_benefits": job.get("teamlyzer_benefits"),
-                    "teamlyzer_description": job.get("teamlyzer_description"),
-                })
-            print(f"CSV criado com sucesso: {csv}")
+                writer.writerow(_linha_get(job))
+            print(f"CSV criado com sucesso: {ficheiro_csv}")
         except OSError as e:
-            print(f"Erro ao escrever o ficheiro CSV '{csv}': {e}")
-    
-# ALÍNEA B) - contagem de vagas por tipo/nome da posição e por região.
+            print(f"Erro ao escrever o ficheiro CSV '{ficheiro_csv}': {e}")
 
-def statistics_zone(csv="statistics_zone.csv"):
-   
-    url = f"{URL}/job/list.json"
-    params = {
-        "api_key": API_KEY,
-        "limit": 200   
-    }
 
-    try:
-        response = requests.get(url, params=params, headers=HEADERS, timeout=10)
+def get_jobs(job_ids, ficheiro=None, workers=8, processos=0, varrer_listagem=False):
+    """
+    Versão em lote do get: obtém vários jobs em paralelo e enriquece-os
+    com o Teamlyzer, fazendo scraping de cada empresa uma só vez por lote.
+    O detalhe dos jobs sai do que já se conhece sempre que possível (ver
+    ResolvedorJobs); só os restantes são pedidos a /job/get.json.
+    Os resultados vão sendo escritos à medida que chegam, num só CSV
+    (ficheiro .csv) ou em JSON Lines (outro ficheiro ou stdout).
+    Exemplo:
+      python emprego.py get --ids-file ids.txt output.csv
+      cat ids.txt | python emprego.py get --ids-file - output.jsonl
+      python emprego.py get --ids-file ids.txt output.csv --processes 4
+      python emprego.py get --ids-file ids_recentes.txt output.csv --scan-list
+    """
+    perfis = PedidosPartilhados()
+    resolvedor = ResolvedorJobs(varrer_listagem=varrer_listagem, workers=workers)
+    # Parsing das páginas do Teamlyzer em processos (--processes N)
+    pool_parse = concurrent.futures.ProcessPoolExecutor(max_workers=processos) if processos > 0 else None
 
-        
-        if response.status_code == 403:
-            print("ERRO: API bloqueada pelo Cloudflare. A tentar alternativa...")
-            response = requests.get(url, params=params, timeout=10)
+    def scrape_partilhado(url_empresa):
+        return perfis.obter(url_empresa, obter_perfil_teamlyzer, url_empresa, pool_parse)
 
-        response.raise_for_status()
-        data = response.json()
+    def processar(job_id):
+        try:
+            job = resolvedor.obter(job_id)
+        except (ApiError, requests.RequestException, json.JSONDecodeError) as e:
+            print(f"Erro ao obter job {job_id}: {e}", file=sys.stderr)
+            return None
+        enrich_job(job, scrape=scrape_partilhado)
+        return job
+
+    # IDs repetidos só são processados uma vez
+    ids = list(dict.fromkeys(job_ids))
+    resolvedor.preparar(ids)
+    exportar_csv = _formato_saida(ficheiro) == "csv"
+    n_escritos = 0
 
-        if "error" in data:
-            print(f"Erro da API: {data['error']}")
-            sys.exit(1)
+    try:
+        with abrir_saida(ficheiro, GET_FIELDNAMES) as escrever:
+            for job in map_concorrente(processar, ids, workers):
+                if job is not None:
+                    escrever(_linha_get(job) if exportar_csv else job)
+                    n_escritos += 1
+    except OSError as e:
+        print(f"Erro ao escrever o ficheiro '{ficheiro}': {e}")
+        return
+    finally:
+        if pool_parse is not None:
+            pool_parse.shutdown()
 
-        jobs = data.get("results", [])
+    if ficheiro:
+        print(f"{n_escritos} jobs exportados para {ficheiro}")
 
-        if not jobs:
-            print("Não foram encontrados trabalhos para gerar estatísticas.")
-            return
 
-        # (Zona, Tipo de Trabalho) -> Nº de vagas
-        contagens = Counter()
+# Pipeline assíncrono do get em lote:
+#   IDs -> [obter job] -> [resolver empresa] -> [perfil Teamlyzer] -> [exportar]
+# Cada estágio tem os seus trabalhadores e liga-se ao seguinte por uma fila
+# limitada, por isso as esperas de rede dos vários estágios sobrepõem-se e
+# a memória fica limitada. Os pedidos HTTP continuam a passar pelo cliente
+# partilhado (em threads); o parsing do HTML pode ir para processos.
 
-        for job in jobs:
-            titulo = job.get("title", "") or "Sem título"
-            locations = job.get("locations") or []
+_FIM = object()
 
-            # Se o anúncio não tiver localizações, conto numa zona "Desconhecida"
-            if not locations:
-                zona = "Desconhecida"
-                contagens[(zona, titulo)] += 1
-            else:
-                # Cada localização conta como uma vaga nessa zona
-                for loc in locations:
-                    zona = loc.get("name", "") or "Desconhecida"
-                    contagens[(zona, titulo)] += 1
 
-        # --- Escrita do CSV ---
+async def _estagio(func, entrada, saida, n_trabalhadores, n_seguinte):
+    """
+    Corre `n_trabalhadores` que aplicam func a cada item da fila de entrada
+    e põem o resultado (se não for None) na fila de saída. No fim avisa os
+    `n_seguinte` trabalhadores do estágio seguinte.
+    """
+    async def trabalhador():
+        while True:
+            item = await entrada.get()
+            if item is _FIM:
+                return
+            resultado = await func(item)
+            if resultado is not None:
+                await saida.put(resultado)
+
+    await asyncio.gather(*(trabalhador() for _ in range(n_trabalhadores)))
+    for _ in range(n_seguinte):
+        await saida.put(_FIM)
+
+
+async def _pipeline_get(job_ids, escrever, workers, pool_parse, resolvedor):
+    loop = asyncio.get_running_loop()
+    em_thread = partial(loop.run_in_executor, None)
+
+    fila_ids = asyncio.Queue(maxsize=2 * workers)
+    fila_jobs = asyncio.Queue(maxsize=2 * workers)
+    fila_empresas = asyncio.Queue(maxsize=2 * workers)
+    fila_saida = asyncio.Queue(maxsize=2 * workers)
+    perfis = {}     # URL da empresa -> tarefa (uma só por empresa)
+    n_resolvedores = 2
+
+    async def produzir_ids():
+        # IDs repetidos só são processados uma vez
+        for job_id in dict.fromkeys(job_ids):
+            await fila_ids.put(job_id)
+        for _ in range(workers):
+            await fila_ids.put(_FIM)
+
+    async def obter_job(job_id):
         try:
-            with open(csv, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["Zona", "Tipo de Trabalho", "Nº de vagas"])
+            return await em_thread(resolvedor.obter, job_id)
+        except (ApiError, requests.RequestException, json.JSONDecodeError) as e:
+            print(f"Erro ao obter job {job_id}: {e}", file=sys.stderr)
+            return None
+
+    async def resolver_empresa(job):
+        company = (job.get("company") or {}).get("name")
+        url_empresa = await em_thread(find_teamlyzer_company_url, company) if company else None
+        return job, url_empresa
+
+    async def scrape_perfil(url_empresa):
+        # Store, pedido e gravação como no get em lote; o parsing corre no
+        # pool de parsing (processos se --processes) em vez de no loop
+        return await em_thread(obter_perfil_teamlyzer, url_empresa, pool_parse)
+
+    async def enriquecer(item):
+        job, url_empresa = item
+        if url_empresa:
+            if url_empresa not in perfis:
+                perfis[url_empresa] = asyncio.ensure_future(scrape_perfil(url_empresa))
+            job.update(await perfis[url_empresa])
+        else:
+            job.update(TEAMLYZER_VAZIO)
+        return job
+
+    async def exportar():
+        n = 0
+        while (job := await fila_saida.get()) is not _FIM:
+            escrever(job)
+            n += 1
+        return n
+
+    resultados = await asyncio.gather(
+        produzir_ids(),
+        _estagio(obter_job, fila_ids, fila_jobs, workers, n_resolvedores),
+        _estagio(resolver_empresa, fila_jobs, fila_empresas, n_resolvedores, workers),
+        _estagio(enriquecer, fila_empresas, fila_saida, workers, 1),
+        exportar(),
+    )
+    return resultados[-1]
+
+
+def get_jobs_async(job_ids, ficheiro=None, workers=8, processos=0, varrer_listagem=False):
+    """
+    Igual ao get_jobs, mas com o pipeline assíncrono por estágios.
+    Com processos > 0 o parsing das páginas do Teamlyzer corre num
+    ProcessPoolExecutor com esse nº de processos.
+    Exemplo:
+      python emprego.py get --ids-file ids.txt output.csv --async --workers 16 --processes 4
+    """
+    exportar_csv = _formato_saida(ficheiro) == "csv"
+    # IDs repetidos só são processados uma vez
+    job_ids = list(dict.fromkeys(job_ids))
+    resolvedor = ResolvedorJobs(varrer_listagem=varrer_listagem, workers=workers)
+    resolvedor.preparar(job_ids)
+    pool_parse = concurrent.futures.ProcessPoolExecutor(max_workers=processos) if processos > 0 else None
+
+    async def correr(escrever):
+        loop = asyncio.get_running_loop()
+        # Threads para o I/O bloqueante: pedidos HTTP e SQLite
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=2 * workers + 4))
+        return await _pipeline_get(job_ids, escrever, workers, pool_parse, resolvedor)
 
-                for (zona, tipo), n_vagas in sorted(contagens.items()):
-                    writer.writerow([zona, tipo, n_vagas])
+    try:
+        with abrir_saida(ficheiro, GET_FIELDNAMES) as escrever:
+            n_escritos = asyncio.run(correr(
+                lambda job: escrever(_linha_get(job) if exportar_csv else job)
+            ))
+    except OSError as e:
+        print(f"Erro ao escrever o ficheiro '{ficheiro}': {e}")
+        return
+    finally:
+        if pool_parse is not None:
+            pool_parse.shutdown()
 
-            print("Ficheiro de exportação criado com sucesso.")
+    if ficheiro:
+        print(f"{n_escritos} jobs exportados para {ficheiro}")
+
+# ALÍNEA B) - contagem de vagas por tipo/nome da posição e por região.
+
+# Dimensões disponíveis para agrupar as vagas -> cabeçalho no CSV
+DIMENSOES = {
+    "zona": "Zona",
+    "titulo": "Tipo de Trabalho",
+    "empresa": "Empresa",
+    "tipo": "Tipo de Contrato",
+    "mes": "Mês de Publicação",
+}
 
-        except OSError as e:
-            print(f"Erro ao escrever o ficheiro CSV '{csv}': {e}")
 
+@cronometrado("colunas (com leitura)")
+def colunas_vagas(jobs):
+    """
+    Achata os anúncios uma só vez numa tabela em colunas (uma lista por
+    dimensão), com uma linha por (anúncio, localização). Um anúncio sem
+    localizações conta numa zona "Desconhecida".
+    """
+    colunas = {dim: [] for dim in DIMENSOES}
+    zona, titulo, empresa, tipo, mes = (colunas[d] for d in ("zona", "titulo", "empresa", "tipo", "mes"))
+
+    for job in jobs:
+        zonas = [loc.get("name", "") or "Desconhecida" for loc in job.get("locations") or []] or ["Desconhecida"]
+        n = len(zonas)
+        zona.extend(zonas)
+        titulo.extend([job.get("title", "") or "Sem título"] * n)
+        empresa.extend([(job.get("company") or {}).get("name") or "Não especificado"] * n)
+        tipo.extend([", ".join(t.get("name", "") for t in job.get("types") or []) or "Não especificado"] * n)
+        mes.extend([(job.get("publishedAt") or "")[:7] or "Desconhecido"] * n)
+    return colunas
+
+
+@cronometrado("agregação")
+def contar_por(colunas, dims):
+    """
+    Nº de vagas por combinação das dimensões `dims`.
+    O Counter sobre o zip das colunas corre todo em C, sem dicts por linha.
+    """
+    return Counter(zip(*(colunas[d] for d in dims)))
+
+
+def tabela_contagens(dims, contagens, pivot=None):
+    """
+    Devolve (cabeçalho, linhas) das contagens. Com `pivot`, os valores dessa
+    dimensão passam a colunas (mais uma coluna Total) e as restantes ficam
+    nas linhas.
+    """
+    if not pivot:
+        cabecalho = [DIMENSOES[d] for d in dims] + ["Nº de vagas"]
+        return cabecalho, [list(chave) + [n_vagas] for chave, n_vagas in sorted(contagens.items())]
+
+    i = dims.index(pivot)
+    linhas = {}
+    for chave, n_vagas in contagens.items():
+        resto = chave[:i] + chave[i + 1:]
+        linhas.setdefault(resto, Counter())[chave[i]] += n_vagas
+    colunas_pivot = sorted({chave[i] for chave in contagens})
+
+    cabecalho = [DIMENSOES[d] for d in dims if d != pivot] + colunas_pivot + ["Total"]
+    return cabecalho, [
+        list(resto) + [por_valor.get(v, 0) for v in colunas_pivot] + [sum(por_valor.values())]
+        for resto, por_valor in sorted(linhas.items())
+    ]
+
+
+@cronometrado("escrita csv")
+def escrever_contagens(ficheiro, dims, contagens, pivot=None):
+    """
+    Escreve as contagens em CSV (ver tabela_contagens).
+    """
+    cabecalho, linhas = tabela_contagens(dims, contagens, pivot)
+    with open(ficheiro, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(cabecalho)
+        writer.writerows(linhas)
+
+
+def statistics_zone(ficheiro_csv="statistics_zone.csv", workers=1, agrupamentos=None, pivot=None):
+    """
+    Conta vagas em todo o catálogo e exporta para CSV.
+    Por omissão agrupa por (zona, título); `agrupamentos` é uma lista de
+    agrupamentos (cada um uma lista de dimensões de DIMENSOES), calculados
+    todos sobre a mesma passagem pelos anúncios. Com mais de um agrupamento
+    cada um vai para o seu ficheiro (<nome>_<dims>.csv).
+    Exemplo:
+      python emprego.py statistics zone
+      python emprego.py statistics zone stats.csv --workers 4
+      python emprego.py statistics zone stats.csv --by zona,tipo --by empresa,mes
+      python emprego.py statistics zone stats.csv --by zona,mes --pivot mes
+    """
+    agrupamentos = agrupamentos or [["zona", "titulo"]]
+
+    try:
+        # Percorre o catálogo completo, página a página, e achata-o em colunas
+        colunas = colunas_vagas(obter_jobs("list", workers=workers))
+
+        if not colunas["zona"]:
+            print("Não foram encontrados trabalhos para gerar estatísticas.")
+            return
+
+        # --- Escrita do(s) CSV ---
+        base, extensao = os.path.splitext(ficheiro_csv)
+        for dims in agrupamentos:
+            ficheiro = ficheiro_csv if len(agrupamentos) == 1 else f"{base}_{'_'.join(dims)}{extensao or '.csv'}"
+            try:
+                escrever_contagens(ficheiro, dims, contar_por(colunas, dims), pivot if pivot in dims else None)
+            except OSError as e:
+                print(f"Erro ao escrever o ficheiro CSV '{ficheiro}': {e}")
+                continue
+            print(f"Ficheiro de exportação criado com sucesso: {ficheiro}")
+
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        sys.exit(1)
     except requests.RequestException as e:
         print(f"Erro ao conectar à API: {e}")
         sys.exit(1)
     except json.JSONDecodeError:
-        print(f"Erro: Resposta inválida da API (Status: {response.status_code})")
+        print("Erro: Resposta inválida da API")
         sys.exit(1)
 
 # ALÍNEA C) - Listar principais skills para um trabalho a partir do Teamlyzer
 
-def list_skills(job_title, count=1000, csv=None):
+def top_skills_teamlyzer(job_title, count=1000):
     """
-    Alínea (c) – Lista as principais (top 10) skills para um determinado trabalho.
-    Pode exportar para CSV se for indicado um ficheiro.
-    Exemplo:
-      python emprego.py list skills "data scientist"
-      python emprego.py list skills "data scientist" --count 500 skills.csv
+    Top 10 skills da página de vagas do Teamlyzer para `job_title`, como
+    [{"skill": ..., "count": ...}]. Lança requests.RequestException se a
+    página não puder ser obtida.
     """
     # Normalizar o título do trabalho para criar a URL
     job_title_normalized = job_title.lower().strip().replace(" ", "")
@@ -587,226 +2870,777 @@ def list_skills(job_title, count=1000, csv=None):
     # Construir URL do Teamlyzer para esse job
     teamlyzer_url = f"{TEAMLYZER_BASE}/companies/jobs?tags={job_title_normalized}order=most_relevant"
     
-    try:
-        response = requests.get(teamlyzer_url, headers=TEAMLYZER_HEADERS, timeout=15)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"Erro ao aceder ao Teamlyzer: {e}")
-        result = [{"skill": job_title, "count": 0}]
-        print(json.dumps(result, indent=2, ensure_ascii=False))
-        return
-    
-    soup = BeautifulSoup(response.text, "lxml")
-    
-    # Lista de skills técnicas válidas
-    valid_skills = {
-        # Linguagens de programação
-        "python", "java", "javascript", "typescript", "c++", "c#", "php", "ruby", 
-        "go", "golang", "rust", "swift", "kotlin", "scala", "r", "matlab",
-        
-        # Frameworks e bibliotecas
-        "react", "angular", "vue", "svelte", "django", "flask", "fastapi", 
-        "spring", "hibernate", "express", "node", "nodejs", "laravel", ".net",
-        "jquery", "bootstrap", "tailwind",
-        
-        # Bases de dados
-        "sql", "postgresql", "mysql", "mongodb", "redis", "cassandra", 
-        "elasticsearch", "oracle", "sqlite", "mariadb", "dynamodb",
-        
-        # DevOps e Cloud
-        "docker", "kubernetes", "aws", "azure", "gcp", "jenkins", "gitlab",
-        "terraform", "ansible", "ci/cd", "linux", "unix", "bash",
-        
-        # Controlo de versões
-        "git", "github", "bitbucket", "svn",
-        
-        # Web
-        "html", "css", "sass", "less", "webpack", "rest", "api", "graphql",
-        "soap", "microservices",
-        
-        # Data Science e AI
-        "machine learning", "ml", "deep learning", "ai", "tensorflow", 
-        "pytorch", "scikit-learn", "pandas", "numpy", "keras", "data science",
-        
-        # Metodologias
-        "agile", "scrum", "kanban", "devops",
-        
-        # Outras tecnologias
-        "spark", "hadoop", "kafka", "rabbitmq", "nginx", "apache"
-    }
-    
-    # Contador de skills encontradas
-    skills_counter = Counter()
+    response = http_get(teamlyzer_url, headers=TEAMLYZER_HEADERS, timeout=15)
+    response.raise_for_status()
     
-    # Obter todo o texto da página
-    page_text = soup.get_text().lower()
+    # Obter todo o texto da página (sem scripts/estilos, como o get_text do bs4)
+    doc = _documento_html(response.text)
+    page_text = "".join(doc.xpath("//text()[not(ancestor::script) and not(ancestor::style)]")).lower()
     
-    # Procurar apenas pelas skills válidas
-    for skill in valid_skills:
-        pattern = r'\b' + re.escape(skill.lower()) + r'\b'
-        occurrences = len(re.findall(pattern, page_text))
-        if occurrences > 0:
-            skills_counter[skill] += occurrences
+    # Procurar apenas pelas skills válidas (uma só passagem pelo texto)
+    skills_counter = MATCHER_TEAMLYZER.contar(page_text)
     
     # Obter top 10 skills
     top_skills = skills_counter.most_common(10)
     
     # Se não encontramos skills, retornar mensagem
     if not top_skills:
-        result = [{"skill": job_title, "count": count}]
-    else:
-        result = [{"skill": skill, "count": cnt} for skill, cnt in top_skills]
+        return [{"skill": job_title, "count": count}]
+    return [{"skill": skill, "count": cnt} for skill, cnt in top_skills]
+
+
+def list_skills(job_title, count=1000, ficheiro_csv=None):
+    """
+    Alínea (c) – Lista as principais (top 10) skills para um determinado trabalho.
+    Pode exportar para CSV se for indicado um ficheiro.
+    Exemplo:
+      python emprego.py list skills "data scientist"
+      python emprego.py list skills "data scientist" --count 500 skills.csv
+    """
+    try:
+        result = top_skills_teamlyzer(job_title, count)
+    except requests.RequestException as e:
+        print(f"Erro ao aceder ao Teamlyzer: {e}")
+        result = [{"skill": job_title, "count": 0}]
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
     
     # Imprimir resultado em formato JSON
     print(json.dumps(result, indent=2, ensure_ascii=False))
 
     # Exportar para CSV se o utilizador pediu
-    if csv:
+    if ficheiro_csv:
         try:
-            with open(csv, "w", newline="", encoding="utf-8") as f:
+            with open(ficheiro_csv, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
                 writer.writerow(["skill", "count"])
                 for item in result:
                     writer.writerow([item["skill"], item["count"]])
-            print(f"CSV criado com sucesso: {csv}")
+            print(f"CSV criado com sucesso: {ficheiro_csv}")
         except OSError as e:
-            print(f"Erro ao escrever o ficheiro CSV '{csv}': {e}")
+            print(f"Erro ao escrever o ficheiro CSV '{ficheiro_csv}': {e}")
 
-# MAIN
+# WATCH: anúncios novos ou alterados
+#
+# O watch consulta /job/list.json de tempos a tempos e só emite (em JSON
+# Lines) os anúncios que ainda não viu ou que mudaram desde a última vez.
+# Os IDs vistos ficam num conjunto compacto id -> marca temporal numa
+# base SQLite própria; como a lista vem do mais recente para o mais
+# antigo, cada ronda só pede páginas até encontrar uma página inteira de
+# anúncios já conhecidos, e o custo cresce com o nº de novidades e não
+# com o tamanho do catálogo.
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Uso:")
-        print("  python emprego.py top N [FICHEIRO_CSV]")
-        print("  python emprego.py search LOCALIDADE EMPRESA N [FICHEIRO_CSV]")
-        print("  python emprego.py type JOB_ID")
-        print("  python emprego.py skills dataInicial dataFinal")
-        print("  python emprego.py get JOB_ID [FICHEIRO_CSV]")
-        print("  python emprego.py statistics zone [FICHEIRO_CSV]")
-        print("  python emprego.py list skills JOB_TITLE [--count N] [FICHEIRO_CSV]")
+WATCH_DB = os.path.join(DATA_DIR, "watch.sqlite")
+WATCH_INTERVALO = 300       # segundos entre rondas
+
+
+def _abrir_vistos(caminho):
+    """
+    Abre o conjunto de anúncios vistos e devolve (ligação, {id: marca}).
+    """
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    db = sqlite3.connect(caminho)
+    db.execute("CREATE TABLE IF NOT EXISTS vistos (id INTEGER PRIMARY KEY, marca TEXT) WITHOUT ROWID")
+    return db, dict(db.execute("SELECT id, marca FROM vistos"))
+
+
+def novidades(vistos, max_conhecidos=TAMANHO_PAGINA):
+    """
+    Percorre a lista de anúncios (do mais recente para o mais antigo) e
+    devolve [(estado, job), ...] com estado "novo" ou "alterado", do mais
+    antigo para o mais recente. Pára depois de `max_conhecidos` anúncios
+    seguidos já vistos e sem alterações.
+    """
+    encontrados = []
+    conhecidos_seguidos = 0
+    # Cada ronda revalida as páginas na origem (ETag) em vez de usar a cópia da cache
+    for job in iter_jobs("list", revalidar=True):
+        marca = vistos.get(int(job["id"]))
+        if marca is not None and _marca_temporal(job) <= marca:
+            conhecidos_seguidos += 1
+            if conhecidos_seguidos >= max_conhecidos:
+                break
+            continue
+        conhecidos_seguidos = 0
+        encontrados.append(("novo" if marca is None else "alterado", job))
+    encontrados.reverse()
+    return encontrados
+
+
+def watch(ficheiro=None, intervalo=WATCH_INTERVALO, uma_vez=False, classificar=False, enriquecer=False,
+          workers=8, estado=WATCH_DB, so_marcar=False):
+    """
+    Emite em JSON Lines (stdout ou ficheiro, sempre em modo de acrescentar)
+    os anúncios novos ou alterados, com o campo "watch": "novo"/"alterado".
+    Opcionalmente acrescenta o regime de trabalho (--classify) e os dados
+    do Teamlyzer (--enrich) só a esses anúncios.
+    Com --mark-only a primeira ronda só regista o catálogo atual, sem o emitir.
+    Exemplo:
+      python emprego.py watch --interval 60 --classify
+      python emprego.py watch --once --enrich novos.jsonl     # p.ex. num cron
+    """
+    db, vistos = _abrir_vistos(estado)
+    perfis = None
+
+    def preparar(par):
+        situacao, job = par
+        job = dict(job, watch=situacao)
+        if classificar:
+            job["regime"] = classificar_regime(job)
+        if enriquecer:
+            enrich_job(job, scrape=lambda url: perfis.obter(url, obter_perfil_teamlyzer, url))
+        return job
+
+    try:
+        with abrir_saida(ficheiro, None, "jsonl", flush_every=1, acrescentar=True) as escrever:
+            while True:
+                try:
+                    encontrados = novidades(vistos)
+                except (ApiError, requests.RequestException, json.JSONDecodeError) as e:
+                    # Uma ronda falhada não acaba com o watch: tenta de novo na próxima
+                    print(f"Erro ao consultar a API: {e}", file=sys.stderr)
+                    encontrados = None
+                    if uma_vez:
+                        sys.exit(1)
+
+                if encontrados:
+                    if not so_marcar:
+                        # Perfis partilhados só dentro da ronda: entre rondas
+                        # vale o TTL do store de perfis
+                        perfis = PedidosPartilhados()
+                        for job in map_concorrente(preparar, encontrados, workers if enriquecer else 1):
+                            escrever(job)
+                    # Só se marcam como vistos depois de emitidos
+                    marcas = [(int(job["id"]), _marca_temporal(job)) for _, job in encontrados]
+                    db.executemany("INSERT OR REPLACE INTO vistos VALUES (?, ?)", marcas)
+                    db.commit()
+                    vistos.update(marcas)
+                if encontrados is not None:
+                    print(f"{len(encontrados)} anúncios novos/alterados; {len(vistos)} conhecidos.", file=sys.stderr)
+                so_marcar = False
+
+                if uma_vez:
+                    break
+                time.sleep(intervalo)
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Erro ao escrever o ficheiro '{ficheiro}': {e}")
         sys.exit(1)
+    finally:
+        db.close()
+
+
+# MODO SERVIDOR (serve)
+#
+# Mantém o processo vivo e responde aos comandos por uma API HTTP local em
+# JSON. As sessões HTTP, o índice de empresas do Teamlyzer, os perfis das
+# empresas e o catálogo de anúncios ficam em memória entre pedidos, por
+# isso só o primeiro pedido paga o arranque e as ligações.
+#
+#   GET /top?n=10
+#   GET /search?localidade=Porto&empresa=KCS%20IT&n=3[&texto=python]
+#   GET /type?id=506697[,506698...]
+#   GET /skills?inicio=2024-01-01&fim=2024-02-01[&por=month]
+#   GET /get?id=506697
+#   GET /statistics/zone[?by=zona,tipo&pivot=tipo]
+#   GET /list/skills?titulo=data%20scientist[&count=1000]
+#   GET /estado          (tamanho e idade do catálogo em memória)
+#   GET /metricas        (métricas do --profile)
+
+SERVE_TTL = 300     # segundos que o catálogo e os perfis em memória são reutilizados
+
+
+class ErroPedido(Exception):
+    """
+    Parâmetros inválidos num pedido ao serve (resposta 400).
+    """
 
-    comando = sys.argv[1]
 
-    
-    # -------------------- COMANDO: top --------------------
-    if comando == "top":
-        if len(sys.argv) < 3:
-            print("ERRO: Falta o argumento N")
-            print("Uso: python emprego.py top N [FICHEIRO_CSV]")
-            sys.exit(1)
+class EstadoServidor:
+    """
+    Estado quente partilhado por todos os pedidos do serve.
+    O catálogo (todos os anúncios de /job/list.json, ou do armazém com
+    --local) é carregado uma vez e recarregado quando passa de `ttl`; as
+    colunas das estatísticas e as skills de cada anúncio são calculadas uma
+    vez por catálogo. Anúncios, perfis e skills do Teamlyzer pedidos
+    individualmente ficam em cache (com pedidos simultâneos partilhados).
+    Nenhum lock é mantido durante uma carga ou um cálculo: enquanto o
+    catálogo expirado é recarregado numa thread, os pedidos continuam a ser
+    respondidos com o antigo, e /get, /type e /list/skills nunca esperam
+    pelo catálogo.
+    """
+
+    def __init__(self, workers=4, ttl=SERVE_TTL):
+        self.workers = workers
+        self.ttl = ttl
+        self.inicio = time.time()
+        self._lock = threading.Lock()           # troca do catálogo
+        self._lock_carga = threading.Lock()     # uma só carga de cada vez
+        self._lock_memorias = threading.Lock()
+        # catálogo atual: (anúncios, carregado_em, derivados, resolvedor)
+        self._atual = (None, 0.0, PedidosPartilhados(), ResolvedorJobs())
+        self._memorias = {}
+        self._memorias_desde = time.time()
+
+    def _carregar(self):
+        # revalidado na origem: senão, com --ttl abaixo do TTL da cache de
+        # páginas, a recarga voltava a ler as mesmas páginas do disco
+        catalogo = list(obter_jobs("list", workers=self.workers, revalidar=True))
+        # /get responde do catálogo em vez de pedir /job/get.json
+        atual = (catalogo, time.time(), PedidosPartilhados(), ResolvedorJobs(jobs=catalogo))
+        with self._lock:
+            self._atual = atual
+        return atual
+
+    def _recarregar(self):
         try:
-            n = int(sys.argv[2])
-            csv = sys.argv[3] if len(sys.argv) >= 4 else None
-            top(n, csv)
-        except ValueError:
-            print(f"ERRO: '{sys.argv[2]}' não é um número válido")
-            sys.exit(1)
-    
-    # -------------------- COMANDO: search --------------------
-    elif comando == "search":
-        if len(sys.argv) < 5:
-            print("ERRO: Faltam argumentos")
-            print("Uso: python emprego.py search LOCALIDADE EMPRESA N [FICHEIRO_CSV]")
-            print("Exemplo: python emprego.py search Porto 'KCS IT' 3 resultados.csv")
-            sys.exit(1)
+            self._carregar()
+        except Exception as e:
+            print(f"Erro ao recarregar o catálogo: {e}", file=sys.stderr)
+        finally:
+            self._lock_carga.release()
+
+    def _versao(self):
+        """
+        O catálogo atual, carregado (ou recarregado em fundo) se preciso.
+        """
+        with self._lock:
+            atual = self._atual
+        catalogo, carregado_em = atual[:2]
+        if catalogo is not None and time.time() - carregado_em <= self.ttl:
+            return atual
+        if catalogo is None:
+            # primeira carga: quem chegar espera por ela
+            with self._lock_carga:
+                with self._lock:
+                    atual = self._atual
+                return atual if atual[0] is not None else self._carregar()
+        if self._lock_carga.acquire(blocking=False):
+            threading.Thread(target=self._recarregar, daemon=True).start()
+        return atual
+
+    def catalogo(self):
+        return self._versao()[0]
+
+    def derivado(self, nome, func):
+        """
+        Valor calculado uma vez por catálogo (p.ex. as colunas das estatísticas).
+        """
+        catalogo, _, derivados, _ = self._versao()
+        try:
+            return derivados.obter(nome, func, catalogo)
+        except Exception:
+            derivados.esquecer(nome)
+            raise
+
+    def memoria(self, tipo, chave, func, *args):
+        """
+        func(*args) guardado em memória durante `ttl`; pedidos simultâneos
+        pela mesma chave esperam pelo primeiro. Erros não ficam guardados.
+        """
+        with self._lock_memorias:
+            if time.time() - self._memorias_desde > self.ttl:
+                self._memorias = {}
+                self._memorias_desde = time.time()
+            partilhados = self._memorias.setdefault(tipo, PedidosPartilhados())
+        try:
+            return partilhados.obter(chave, func, *args)
+        except Exception:
+            partilhados.esquecer(chave)
+            raise
+
+    def job(self, job_id):
+        with self._lock:
+            resolvedor = self._atual[3]
+        return self.memoria("job", str(job_id), resolvedor.obter, job_id)
+
+    def perfil(self, url_empresa):
+        return self.memoria("perfil", url_empresa, obter_perfil_teamlyzer, url_empresa)
+
+    def resumo(self):
+        with self._lock:
+            catalogo, carregado_em = self._atual[:2]
+        return {
+            "ativo_ha_s": round(time.time() - self.inicio, 1),
+            "anuncios_em_memoria": len(catalogo) if catalogo is not None else None,
+            "idade_catalogo_s": round(time.time() - carregado_em, 1) if catalogo is not None else None,
+            "a_recarregar": self._lock_carga.locked(),
+            "ttl_s": self.ttl,
+            "armazem_local": USAR_ARMAZEM,
+        }
+
+
+def _parametro(query, nome, tipo=str, default=None, obrigatorio=False, minimo=None):
+    valores = query.get(nome)
+    if not valores or valores[0] == "":
+        if obrigatorio:
+            raise ErroPedido(f"falta o parâmetro '{nome}'")
+        return default
+    try:
+        valor = tipo(valores[0])
+    except ValueError:
+        raise ErroPedido(f"valor inválido para '{nome}': {valores[0]!r}")
+    if minimo is not None and valor < minimo:
+        raise ErroPedido(f"'{nome}' tem de ser pelo menos {minimo}")
+    return valor
+
+
+def _skills_por_job(catalogo):
+    """
+    (dia de publicação, Counter de skills) de cada anúncio do catálogo.
+    """
+    return [((job.get("publishedAt") or "")[:10], MATCHER_ITJOBS.contar(_texto_skills(job))) for job in catalogo]
+
+
+def _api_top(estado, query):
+    n = _parametro(query, "n", int, 10, minimo=0)
+    return estado.catalogo()[:n]
+
+
+def _api_search(estado, query):
+    localidade = _parametro(query, "localidade", obrigatorio=True)
+    empresa = _parametro(query, "empresa", obrigatorio=True)
+    n = _parametro(query, "n", int, 10, minimo=0)
+    texto = _parametro(query, "texto")
+    if USAR_ARMAZEM:
+        return list(pesquisar_local(localidade, empresa, n, texto=texto))
+    if texto:
+        raise ErroPedido("'texto' só está disponível com o armazém local (serve --local)")
+    empresa = empresa.lower()
+    da_empresa = (job for job in estado.catalogo()
+                  if empresa in ((job.get("company") or {}).get("name") or "").lower())
+    return list(islice(_filtrar_part_time(da_empresa, localidade), n))
+
+
+def _api_type(estado, query):
+    ids = _parametro(query, "id", obrigatorio=True).split(",")
+    return [{"id": job_id, "regime": classificar_regime(estado.job(job_id))} for job_id in ids]
+
+
+def _api_skills(estado, query):
+    inicio = _parametro(query, "inicio", default="")
+    fim = _parametro(query, "fim", default="9999")
+    por = _parametro(query, "por")
+    if por and por not in PERIODOS:
+        raise ErroPedido(f"período desconhecido '{por}' (use: {', '.join(PERIODOS)})")
+
+    if USAR_ARMAZEM:
+        if por:
+            return [{"periodo": periodo, "skills": dict(c.most_common())}
+                    for periodo, c in skills_locais(inicio, fim, por)]
+        return [dict(skills_locais(inicio, fim).most_common())]
+
+    serie = {}
+    for dia, contagem in estado.derivado("skills", _skills_por_job):
+        if inicio <= dia < fim:
+            serie.setdefault(dia[:PERIODOS[por]] if por else "", Counter()).update(contagem)
+    if por:
+        return [{"periodo": periodo, "skills": dict(c.most_common())} for periodo, c in sorted(serie.items())]
+    return [dict(serie.get("", Counter()).most_common())]
+
+
+def _api_get(estado, query):
+    job = dict(estado.job(_parametro(query, "id", obrigatorio=True)))
+    enrich_job(job, scrape=estado.perfil)
+    return job
+
+
+def _api_statistics_zone(estado, query):
+    dims = _parametro(query, "by", default="zona,titulo").split(",")
+    pivot = _parametro(query, "pivot")
+    desconhecidas = [d for d in dims + ([pivot] if pivot else []) if d not in DIMENSOES]
+    if desconhecidas:
+        raise ErroPedido(f"dimensão desconhecida '{desconhecidas[0]}' (use: {', '.join(DIMENSOES)})")
+    if pivot and pivot not in dims:
+        raise ErroPedido("'pivot' tem de ser uma das dimensões de 'by'")
+    colunas = estado.derivado("colunas", colunas_vagas)
+    cabecalho, linhas = tabela_contagens(dims, contar_por(colunas, dims), pivot)
+    return [dict(zip(cabecalho, linha)) for linha in linhas]
+
+
+def _api_list_skills(estado, query):
+    titulo = _parametro(query, "titulo", obrigatorio=True)
+    count = _parametro(query, "count", int, 1000)
+    return estado.memoria("list skills", (titulo, count), top_skills_teamlyzer, titulo, count)
+
+
+ROTAS_SERVIDOR = {
+    "/top": _api_top,
+    "/search": _api_search,
+    "/type": _api_type,
+    "/skills": _api_skills,
+    "/get": _api_get,
+    "/statistics/zone": _api_statistics_zone,
+    "/list/skills": _api_list_skills,
+    "/estado": lambda estado, query: estado.resumo(),
+    "/metricas": lambda estado, query: METRICAS.resumo(),
+}
+
+
+def _handler_servidor(estado):
+    """
+    Classe de handler HTTP ligada ao estado do servidor.
+    """
+    from http.server import BaseHTTPRequestHandler
+    from urllib.parse import parse_qs
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, formato, *args):
+            print(f"{self.address_string()} {formato % args}", file=sys.stderr)
+
+        def responder(self, status, dados):
+            corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            partes = urlsplit(self.path)
+            rota = ROTAS_SERVIDOR.get(partes.path.rstrip("/") or "/estado")
+            if rota is None:
+                self.responder(404, {"erro": f"caminho desconhecido: {partes.path}",
+                                     "caminhos": sorted(ROTAS_SERVIDOR)})
+                return
+            try:
+                with medir(f"serve {partes.path}"):
+                    resultado = rota(estado, parse_qs(partes.query))
+            except ErroPedido as e:
+                self.responder(400, {"erro": str(e)})
+            except ApiError as e:
+                self.responder(404, {"erro": f"Erro da API: {e}"})
+            except requests.RequestException as e:
+                self.responder(502, {"erro": f"Erro ao conectar: {e}"})
+            except (json.JSONDecodeError, sqlite3.OperationalError) as e:
+                self.responder(502, {"erro": str(e)})
+            except Exception as e:
+                print(f"Erro em {self.path}: {e!r}", file=sys.stderr)
+                self.responder(500, {"erro": f"Erro interno: {e}"})
+            else:
+                self.responder(200, resultado)
+
+    return Handler
+
+
+def serve(host="127.0.0.1", porta=8000, workers=4, ttl=SERVE_TTL):
+    """
+    Serve os comandos como endpoints JSON até ser interrompido (Ctrl+C).
+    O catálogo começa a ser carregado logo no arranque, em segundo plano.
+    Exemplo:
+      python emprego.py serve --port 8000
+      curl 'http://127.0.0.1:8000/search?localidade=Porto&empresa=KCS%20IT&n=3'
+    """
+    from http.server import ThreadingHTTPServer
+
+    estado = EstadoServidor(workers, ttl)
+    servidor = ThreadingHTTPServer((host, porta), _handler_servidor(estado))
+    servidor.daemon_threads = True
+
+    def aquecer():
+        try:
+            estado.catalogo()
+        except (ApiError, requests.RequestException, json.JSONDecodeError) as e:
+            print(f"Aviso: não foi possível carregar o catálogo: {e}", file=sys.stderr)
+
+    threading.Thread(target=aquecer, daemon=True).start()
+    print(f"A servir em http://{host}:{servidor.server_port}/ (Ctrl+C para terminar)", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+# MAIN
+#
+# Cada comando é um subparser do argparse com a sua função _cmd_*; as
+# opções comuns (--format, --output, --workers, --cache, ...) valem para
+# todos e podem vir antes ou depois do comando. Os argumentos posicionais
+# continuam a ser os de sempre (p.ex. "top 10 saida.csv").
+
+
+class _Parser(argparse.ArgumentParser):
+    """
+    ArgumentParser que, nos comandos finais, aceita opções no meio dos
+    argumentos posicionais (p.ex. "list skills python --count 5 saida.csv").
+    """
+
+    def parse_known_args(self, args=None, namespace=None):
+        if self._subparsers is not None or getattr(self, "_intercalado", False):
+            return super().parse_known_args(args, namespace)
+        self._intercalado = True
+        try:
+            return self.parse_known_intermixed_args(args, namespace)
+        finally:
+            self._intercalado = False
+
+
+def _opcoes_comuns(parser, suprimir=False):
+    """
+    Acrescenta as opções comuns a `parser`. Nos subparsers (suprimir=True)
+    não têm default, para não apagarem o valor dado antes do comando.
+    """
+    def default(valor):
+        return argparse.SUPPRESS if suprimir else valor
+
+    grupo = parser.add_argument_group("opções comuns")
+    grupo.add_argument("--format", choices=["json", "jsonl"], default=default("json"),
+                       help="formato do stdout de top/search: json (array) ou jsonl (um por linha)")
+    grupo.add_argument("-o", "--output", metavar="FICHEIRO", default=default(None),
+                       help="ficheiro de saída (.csv ou .jsonl), em alternativa ao argumento posicional")
+    grupo.add_argument("--workers", type=int, metavar="N", default=default(None),
+                       help="pedidos/páginas em paralelo")
+    grupo.add_argument("--processes", type=int, metavar="N", default=default(0),
+                       help="limpeza/parsing de HTML em N processos nas exportações e no get em lote")
+    grupo.add_argument("--cache", choices=["on", "off", "refresh"], default=default("on"),
+                       help="cache em disco: on, off ou refresh (revalida tudo)")
+    grupo.add_argument("--no-cache", dest="cache", action="store_const", const="off", default=default("on"),
+                       help=argparse.SUPPRESS)
+    grupo.add_argument("--refresh", dest="cache", action="store_const", const="refresh", default=default("on"),
+                       help=argparse.SUPPRESS)
+    grupo.add_argument("--rate", type=float, metavar="N", default=default(None),
+                       help="máximo de pedidos por segundo à API")
+    grupo.add_argument("--local", action="store_true", default=default(False),
+                       help="search/skills/statistics sobre o armazém local (ver sync)")
+    grupo.add_argument("--profile", action="store_true", default=default(False),
+                       help="resumo de pedidos, cache e etapas no stderr ao sair")
+    grupo.add_argument("--profile-json", action="store_true", default=default(False),
+                       help="o mesmo resumo, em JSON")
+    grupo.add_argument("--cprofile", metavar="FICHEIRO", default=default(None),
+                       help="guarda o perfil do cProfile (só a thread principal)")
+
+
+def _saida(args, posicional=None):
+    """
+    Ficheiro de saída: --output tem precedência sobre o argumento posicional.
+    """
+    return args.output or posicional
+
+
+def _cmd_top(args):
+    top(args.n, _saida(args, args.ficheiro), args.format, args.processes)
+
+
+def _cmd_search(args):
+    search(args.localidade, args.empresa, args.n, _saida(args, args.ficheiro), args.format,
+           args.text, args.processes)
+
+
+def _cmd_type(args):
+    if args.ids_file or args.jobs_file:
+        # com --ids-file/--jobs-file o posicional é o ficheiro de saída
+        ficheiro = _saida(args, args.job_id)
         try:
-            localidade = sys.argv[2]
-            empresa = sys.argv[3]
-            n = int(sys.argv[4])
-            csv = sys.argv[5] if len(sys.argv) >= 6 else None
-            search(localidade, empresa, n, csv)
-        except ValueError:
-            print(f"ERRO: '{sys.argv[4]}' não é um número válido")
+            if args.jobs_file:
+                type_jobs(jobs=ler_jobs(args.jobs_file), ficheiro=ficheiro)
+            else:
+                type_jobs(ler_ids(args.ids_file), ficheiro=ficheiro, workers=args.workers or 8,
+                          varrer_listagem=args.scan_list)
+        except requests.RequestException as e:
+            # requests.ConnectionError também é um OSError
+            print(f"Erro ao conectar à API: {e}")
             sys.exit(1)
-     
-    # -------------------- COMANDO: type --------------------
-    elif comando in ("type", "tipo", "regime"):
-        if len(sys.argv) < 3:
-            print("ERRO: Falta o argumento JOB_ID")
-            print("Uso: python emprego.py type JOB_ID")
+        except OSError as e:
+            print(f"Erro ao ler o ficheiro '{args.jobs_file or args.ids_file}': {e}")
             sys.exit(1)
-        job_id = sys.argv[2]
-        type_job(job_id)
-
-    # -------------------- COMANDO: skills --------------------
-    elif comando == "skills":
-        if len(sys.argv) < 4:
-            print("ERRO: Faltam argumentos")
-            print("Uso: python emprego.py skills dataInicial dataFinal")
+        except json.JSONDecodeError as e:
+            print(f"Erro: linha inválida em '{args.jobs_file}': {e}")
             sys.exit(1)
-        data_inicial = sys.argv[2]
-        data_final = sys.argv[3]
-        skills(data_inicial, data_final)
-    
-        
-        # -------------------- TP2: comando get --------------------
-    elif comando == "get":
-        if len(sys.argv) < 3:
-            print("Uso: python emprego.py get JOB_ID [FICHEIRO_CSV]")
+        return
+    if not args.job_id:
+        args.parser.error("falta o argumento JOB_ID (ou --ids-file/--jobs-file)")
+    type_job(args.job_id)
+
+
+def _cmd_sync(args):
+    try:
+        sync(args.full, args.workers or 1)
+    except ApiError as e:
+        print(f"Erro da API: {e}")
+        sys.exit(1)
+    except requests.RequestException as e:
+        print(f"Erro ao conectar à API: {e}")
+        sys.exit(1)
+
+
+def _cmd_skills(args):
+    skills(args.data_inicial, args.data_final, args.workers or 1, args.by)
+
+
+def _cmd_get(args):
+    if args.ids_file:
+        # com --ids-file o posicional é o ficheiro de saída
+        ficheiro = _saida(args, args.job_id)
+        funcao = get_jobs_async if args.modo_async else get_jobs
+        try:
+            funcao(ler_ids(args.ids_file), ficheiro, args.workers or 8, args.processes,
+                   varrer_listagem=args.scan_list)
+        except requests.RequestException as e:
+            # requests.ConnectionError também é um OSError
+            print(f"Erro ao conectar à API: {e}")
             sys.exit(1)
-        job_id = sys.argv[2]
-        csv = sys.argv[3] if len(sys.argv) >= 4 else None
-        get_job(job_id, csv)
-
-        # -------------------- TP2: comando statistics --------------------
-    elif comando == "statistics":
-        if len(sys.argv) < 3:
-            print("ERRO: Falta o argumento 'zone'")
-            print("Uso: python emprego.py statistics zone")
+        except OSError as e:
+            print(f"Erro ao ler o ficheiro de IDs '{args.ids_file}': {e}")
             sys.exit(1)
+        return
+    if not args.job_id:
+        args.parser.error("falta o argumento JOB_ID (ou --ids-file)")
+    get_job(args.job_id, _saida(args, args.ficheiro))
 
-        subcomando = sys.argv[2].lower()
 
-        if subcomando == "zone":
-            
-            csv = sys.argv[3] if len(sys.argv) >= 4 else "statistics_zone.csv"
-            statistics_zone(csv)
-        else:
-            print(f"Subcomando desconhecido para 'statistics': {subcomando}")
-            print("Uso: python emprego.py statistics zone")
-            sys.exit(1)
+def _dimensoes(valor):
+    dims = valor.split(",")
+    for dim in dims:
+        if dim not in DIMENSOES:
+            raise argparse.ArgumentTypeError(f"dimensão desconhecida '{dim}' (use: {', '.join(DIMENSOES)})")
+    return dims
 
-        # -------------------- TP2: comando list skills --------------------
-    elif comando == "list":
-        if len(sys.argv) < 3:
-            print("ERRO: Falta o subcomando")
-            print("Uso: python emprego.py list skills JOB_TITLE [--count N] [FICHEIRO_CSV]")
-            sys.exit(1)
-        
-        subcomando = sys.argv[2].lower()
-        
-        if subcomando == "skills":
-            if len(sys.argv) < 4:
-                print("ERRO: Falta o argumento JOB_TITLE")
-                print("Uso: python emprego.py list skills JOB_TITLE [--count N] [FICHEIRO_CSV]")
-                sys.exit(1)
-            
-            job_title = sys.argv[3]
-            count = 1000  # valor padrão
-            csv = None
-
-            # Processar argumentos restantes: [--count N] [FICHEIRO_CSV]
-            i = 4
-            while i < len(sys.argv):
-                arg = sys.argv[i]
-                if arg == "--count":
-                    if i + 1 >= len(sys.argv):
-                        print("ERRO: Falta o valor para --count")
-                        sys.exit(1)
-                    try:
-                        count = int(sys.argv[i + 1])
-                    except ValueError:
-                        print(f"ERRO: '{sys.argv[i + 1]}' não é um número válido")
-                        sys.exit(1)
-                    i += 2
-                else:
-                    # Qualquer outro argumento assumo que é o ficheiro CSV
-                    csv = arg
-                    i += 1
-            
-            list_skills(job_title, count, csv)
-        else:
-            print(f"Subcomando desconhecido para 'list': {subcomando}")
-            print("Uso: python emprego.py list skills JOB_TITLE [--count N] [FICHEIRO_CSV]")
-            sys.exit(1)
\ No newline at end of file
+
+def _cmd_watch(args):
+    watch(_saida(args, args.ficheiro), args.interval, args.once, args.classify, args.enrich,
+          args.workers or 8, args.state, args.mark_only)
+
+
+def _cmd_serve(args):
+    serve(args.host, args.port, args.workers or 4, args.ttl)
+
+
+def _cmd_statistics_zone(args):
+    statistics_zone(_saida(args, args.ficheiro) or "statistics_zone.csv", args.workers or 1,
+                    args.by or [], args.pivot)
+
+
+def _cmd_list_skills(args):
+    list_skills(args.job_title, args.count, _saida(args, args.ficheiro))
+
+
+def criar_parser():
+    """
+    Parser da linha de comandos (um subcomando por comando).
+    """
+    parser = _Parser(
+        prog="emprego.py",
+        description="Consulta de ofertas de emprego do itjobs.pt e dados do Teamlyzer.",
+        epilog="Variáveis: EMPREGO_RECORD=PASTA (grava as respostas), "
+               "EMPREGO_REPLAY=PASTA (responde das gravações), EMPREGO_DATA_DIR=PASTA (cache e armazém)",
+    )
+    _opcoes_comuns(parser)
+    comandos = parser.add_subparsers(dest="comando", metavar="COMANDO")
+
+    def comando(nome, funcao, ajuda, **kwargs):
+        sub = comandos.add_parser(nome, help=ajuda, description=ajuda, **kwargs)
+        _opcoes_comuns(sub, suprimir=True)
+        sub.set_defaults(func=funcao, parser=sub)
+        return sub
+
+    sub = comando("top", _cmd_top, "os N trabalhos mais recentes")
+    sub.add_argument("n", type=int, metavar="N")
+    sub.add_argument("ficheiro", nargs="?", metavar="FICHEIRO_CSV|FICHEIRO_JSONL")
+
+    sub = comando("search", _cmd_search, "trabalhos part-time de uma empresa numa localidade")
+    sub.add_argument("localidade", metavar="LOCALIDADE")
+    sub.add_argument("empresa", metavar="EMPRESA")
+    sub.add_argument("n", type=int, metavar="N")
+    sub.add_argument("ficheiro", nargs="?", metavar="FICHEIRO_CSV|FICHEIRO_JSONL")
+    sub.add_argument("--text", metavar="TEXTO", help="pesquisa no título/descrição (só com --local)")
+
+    sub = comando("type", _cmd_type, "regime de trabalho (remoto/híbrido/presencial)", aliases=["tipo", "regime"])
+    sub.add_argument("job_id", nargs="?", metavar="JOB_ID|FICHEIRO_SAIDA")
+    sub.add_argument("--ids-file", metavar="FICHEIRO|-", help="IDs a classificar (em lote)")
+    sub.add_argument("--jobs-file", metavar="DUMP.jsonl", help="classifica anúncios já guardados, sem pedidos")
+    sub.add_argument("--scan-list", action="store_true",
+                     help=f"procura os IDs nas primeiras {LISTAGEM_MAX_PAGINAS} páginas da listagem antes de os pedir um a um")
+
+    sub = comando("sync", _cmd_sync, "atualiza o armazém local de anúncios")
+    sub.add_argument("--full", action="store_true", help="percorre o catálogo todo")
+
+    sub = comando("skills", _cmd_skills, "contagem de skills entre duas datas")
+    sub.add_argument("data_inicial", metavar="dataInicial")
+    sub.add_argument("data_final", metavar="dataFinal")
+    sub.add_argument("--by", choices=list(PERIODOS), help="série temporal por dia, mês ou ano")
+
+    sub = comando("get", _cmd_get, "anúncio enriquecido com dados do Teamlyzer")
+    sub.add_argument("job_id", nargs="?", metavar="JOB_ID|FICHEIRO_SAIDA")
+    sub.add_argument("ficheiro", nargs="?", metavar="FICHEIRO_CSV")
+    sub.add_argument("--ids-file", metavar="FICHEIRO|-", help="IDs a obter (em lote)")
+    sub.add_argument("--async", dest="modo_async", action="store_true", help="pipeline assíncrono")
+    sub.add_argument("--scan-list", action="store_true",
+                     help=f"procura os IDs nas primeiras {LISTAGEM_MAX_PAGINAS} páginas da listagem antes de os pedir um a um")
+
+    sub = comando("watch", _cmd_watch, "emite só os anúncios novos ou alterados, de tempos a tempos")
+    sub.add_argument("ficheiro", nargs="?", metavar="FICHEIRO_JSONL", help="acrescenta a este ficheiro (senão, stdout)")
+    sub.add_argument("--interval", type=float, default=WATCH_INTERVALO, metavar="SEGUNDOS",
+                     help=f"intervalo entre rondas (default {WATCH_INTERVALO})")
+    sub.add_argument("--once", action="store_true", help="faz uma só ronda e termina (para cron)")
+    sub.add_argument("--classify", action="store_true", help="acrescenta o regime de trabalho")
+    sub.add_argument("--enrich", action="store_true", help="acrescenta os dados do Teamlyzer")
+    sub.add_argument("--state", default=WATCH_DB, metavar="FICHEIRO",
+                     help="base com os anúncios já vistos (default: na pasta de dados)")
+    sub.add_argument("--mark-only", action="store_true",
+                     help="a primeira ronda só regista o catálogo atual, sem o emitir")
+
+    sub = comando("serve", _cmd_serve, "serve os comandos numa API HTTP local em JSON")
+    sub.add_argument("--host", default="127.0.0.1")
+    sub.add_argument("--port", type=int, default=8000)
+    sub.add_argument("--ttl", type=float, default=SERVE_TTL, metavar="SEGUNDOS",
+                     help=f"validade do catálogo e dos perfis em memória (default {SERVE_TTL})")
+
+    sub = comando("statistics", None, "estatísticas do catálogo")
+    estatisticas = sub.add_subparsers(dest="subcomando", metavar="zone", required=True)
+    sub = estatisticas.add_parser("zone", help="nº de vagas por zona (ou outros agrupamentos)")
+    _opcoes_comuns(sub, suprimir=True)
+    sub.set_defaults(func=_cmd_statistics_zone, parser=sub)
+    sub.add_argument("ficheiro", nargs="?", metavar="FICHEIRO_CSV")
+    sub.add_argument("--by", type=_dimensoes, action="append", metavar="DIM,DIM",
+                     help=f"agrupamento (pode repetir-se); dimensões: {', '.join(DIMENSOES)}")
+    sub.add_argument("--pivot", choices=list(DIMENSOES), metavar="DIM", help="dimensão que passa a colunas")
+
+    sub = comando("list", None, "listagens do Teamlyzer")
+    listas = sub.add_subparsers(dest="subcomando", metavar="skills", required=True)
+    sub = listas.add_parser("skills", help="principais skills de um tipo de trabalho")
+    _opcoes_comuns(sub, suprimir=True)
+    sub.set_defaults(func=_cmd_list_skills, parser=sub)
+    sub.add_argument("job_title", metavar="JOB_TITLE")
+    sub.add_argument("ficheiro", nargs="?", metavar="FICHEIRO_CSV")
+    sub.add_argument("--count", type=int, default=1000, metavar="N")
+
+    return parser
+
+
+def main(argv=None):
+    global USAR_ARMAZEM, CACHE_ATIVA, CACHE_REFRESH, PERFIL_ATIVO
+
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "func", None):
+        parser.print_help()
+        sys.exit(1)
+
+    if args.rate:
+        PEDIDOS_POR_SEGUNDO[urlsplit(URL).netloc] = args.rate
+    USAR_ARMAZEM = args.local
+    CACHE_ATIVA = args.cache != "off"
+    CACHE_REFRESH = args.cache == "refresh"
+    PERFIL_ATIVO = args.profile or args.profile_json
+    if PERFIL_ATIVO:
+        atexit.register(imprimir_perfil, "json" if args.profile_json else "tabela")
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        atexit.register(profiler.dump_stats, args.cprofile)
+        atexit.register(profiler.disable)
+        profiler.enable()
+
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()